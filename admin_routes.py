@@ -1,16 +1,18 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
-from models import db, User, Product, ProductPricing, Order, OrderItem, Category, HomeSection, UserLog, SiteSetting
+from models import db, User, Product, ProductPricing, Order, OrderItem, Category, HomeSection, UserLog, normalize_phone
 from translations import translations, get_trans
+from catalog import bump_catalog_version, encode_cursor, decode_cursor, keyset_filter, keyset_order
+from recommendations import record_order
+from sales import record_status_change, orders_by_status, revenue_report, REPORT_DAYS
+from queries import products_for_admin, product_for_edit, order_with_items, logs_with_users
+from settings import get_settings, set_setting
+from search import substring_match
+from image_service import optimize_and_save_image
 import os
-import uuid
-import io
 from functools import wraps
-from werkzeug.utils import secure_filename
-from datetime import datetime
-from PIL import Image
-import cloudinary
-import cloudinary.uploader
+from datetime import datetime, timedelta
+from sqlalchemy import tuple_, func, false, union_all
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -20,48 +22,6 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def optimize_and_save_image(file):
-    filename = secure_filename(file.filename)
-    filename_base = filename.rsplit('.', 1)[0]
-
-    try:
-        img = Image.open(file)
-        max_width = 1024
-        if img.width > max_width:
-             ratio = max_width / float(img.width)
-             new_height = int(float(img.height) * ratio)
-             img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-
-        # Save to buffer
-        output_buffer = io.BytesIO()
-        img.save(output_buffer, format='WEBP', optimize=True, quality=80)
-        output_buffer.seek(0)
-
-        # Upload to Cloudinary
-        upload_result = cloudinary.uploader.upload(
-            output_buffer,
-            folder="luxfakya",
-            public_id=f"{filename_base}_{uuid.uuid4().hex[:8]}",
-            format="webp"
-        )
-
-        return upload_result['secure_url']
-
-    except Exception as e:
-        current_app.logger.error(f"Cloudinary upload error: {e}")
-        # Fallback to direct upload if optimization fails or Cloudinary fails
-        try:
-            file.seek(0)
-            upload_result = cloudinary.uploader.upload(
-                file,
-                folder="luxfakya"
-            )
-            return upload_result['secure_url']
-        except Exception as e2:
-            current_app.logger.error(f"Cloudinary fallback upload error: {e2}")
-            # If everything fails, we'd need another fallback, but for now we expect Cloudinary to work
-            return "https://via.placeholder.com/300"
-
 @admin_bp.before_request
 def restrict_access():
     if request.endpoint == 'admin.login':
@@ -242,83 +202,274 @@ def logout():
     logout_user()
     return redirect(url_for('main.index'))
 
+def _is_orders_only():
+    """"Orders Only" moderators do not see the dashboard or the product table."""
+    return getattr(current_user, 'role', 'customer') != 'admin' and \
+       current_user.can_manage_orders and \
+       not (current_user.can_manage_users or current_user.can_manage_products or current_user.can_manage_content)
+
+# Dashboard product table: sort keys map to (column, descending), with the
+# primary key as tiebreaker so (value, id) works as a keyset cursor.
+ADMIN_PRODUCT_SORTS = {
+    'newest': (Product.id, True),
+    'name_asc': (Product.name, False),
+    'name_desc': (Product.name, True),
+    'price_asc': (Product.price, False),
+    'price_desc': (Product.price, True),
+}
+ADMIN_PRODUCTS_PER_PAGE = 50
+
+
+def _admin_products_page():
+    """
+    Resolves the dashboard query string (search, category, sort, after) to one page
+    of products. Returns (products, next_cursor, total, filters). The dashboard
+    renders the first page; /admin/api/products serves the following ones.
+    """
+    search = request.args.get('search', '').strip()
+    category_id = request.args.get('category', '')
+    sort_by = request.args.get('sort', 'newest')
+    if sort_by not in ADMIN_PRODUCT_SORTS:
+        sort_by = 'newest'
+    column, descending = ADMIN_PRODUCT_SORTS[sort_by]
+
+    query = products_for_admin()
+    if search:
+        query = query.filter(substring_match('product', search))
+    if category_id.isdigit():
+        query = query.filter(Product.category_id == int(category_id))
+    total = query.with_entities(func.count(Product.id)).order_by(None).scalar()
+
+    # Same seek as the shop: a cursor that does not fit the sort is ignored
+    seek = keyset_filter(column, descending, request.args.get('after'))
+    if seek is not None:
+        query = query.filter(seek)
+    products = query.order_by(*keyset_order(column, descending)).limit(ADMIN_PRODUCTS_PER_PAGE + 1).all()
+
+    next_cursor = None
+    if len(products) > ADMIN_PRODUCTS_PER_PAGE:
+        products = products[:ADMIN_PRODUCTS_PER_PAGE]
+        last = products[-1]
+        next_cursor = encode_cursor([getattr(last, column.key), last.id])
+
+    filters = {'search': search, 'category': category_id, 'sort': sort_by}
+    return products, next_cursor, total, {key: value for key, value in filters.items() if value}
+
+
+def _tier_label(pricing):
+    if pricing.display_unit == 'g':
+        return f"{int(round(pricing.quantity * 1000))}g"
+    if pricing.display_unit == 'Kg':
+        return f"{pricing.quantity:g}kg"
+    return f"{pricing.quantity:g} {pricing.display_unit}"
+
+
+def _admin_product_row(product):
+    """One dashboard table row, as rendered by the template and returned by the JSON endpoint."""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'category': product.category.name if product.category else '',
+        'price': product.price,
+        'unit': product.unit,
+        'image_url': product.display_image_url,
+        'is_hidden': bool(product.is_hidden),
+        'is_out_of_stock': bool(product.is_out_of_stock),
+        'tiers': [{'label': _tier_label(p), 'price': p.price} for p in product.pricings],
+        'edit_url': url_for('admin.edit_product', product_id=product.id),
+        'delete_url': url_for('admin.delete_product', product_id=product.id),
+        'toggle_hidden_url': url_for('admin.toggle_hidden', product_id=product.id),
+        'toggle_stock_url': url_for('admin.toggle_stock', product_id=product.id),
+    }
+
 @admin_bp.route('/')
 @login_required
 def dashboard():
     # Restrict "Orders Only" moderators from seeing the dashboard
-    if getattr(current_user, 'role', 'customer') != 'admin' and \
-       current_user.can_manage_orders and \
-       not (current_user.can_manage_users or current_user.can_manage_products or current_user.can_manage_content):
+    if _is_orders_only():
         return redirect(url_for('admin.orders'))
 
-    # Filter Parameters
-    search = request.args.get('search', '').strip()
-    category_id = request.args.get('category')
-    sort_by = request.args.get('sort', 'newest')
-
-    query = Product.query
-
-    if search:
-        query = query.filter(Product.name.ilike(f'%{search}%'))
-
-    if category_id and category_id.isdigit():
-         query = query.filter(Product.category_id == int(category_id))
-
-    # Sorting
-    if sort_by == 'name_asc':
-        query = query.order_by(Product.name.asc())
-    elif sort_by == 'name_desc':
-        query = query.order_by(Product.name.desc())
-    elif sort_by == 'price_asc':
-        query = query.order_by(Product.price.asc())
-    elif sort_by == 'price_desc':
-        query = query.order_by(Product.price.desc())
-    else: # newest or default
-        query = query.order_by(Product.id.desc())
-
-    products = query.all()
+    products, next_cursor, total_matching, filters = _admin_products_page()
     categories = Category.query.all()
 
-    # Statistics
-    total_orders = Order.query.filter(Order.status.notin_(['Cancelled', 'Pending'])).count()
-    pending_orders = Order.query.filter_by(status='Pending').count()
+    # Statistics, from the daily rollups rather than the order table (see sales.py)
+    by_status = orders_by_status()
+    total_orders = sum(orders for status, (orders, _) in by_status.items() if status not in ('Cancelled', 'Pending'))
+    pending_orders = by_status.get('Pending', (0, 0))[0]
     total_users = User.query.count()
     total_products = Product.query.count()
-
-    # Calculate total revenue
-    total_revenue = db.session.query(db.func.sum(Order.total_amount)).filter(Order.status == 'Completed').scalar() or 0
+    total_revenue = by_status.get('Completed', (0, 0))[1]
 
     return render_template('admin/dashboard.html',
-                           products=products,
+                           rows=[_admin_product_row(p) for p in products],
+                           next_cursor=next_cursor,
+                           total_matching=total_matching,
+                           filters=filters,
                            categories=categories,
-                           search=search,
-                           category_id=category_id,
-                           sort_by=sort_by,
+                           search=filters.get('search', ''),
+                           category_id=filters.get('category'),
+                           sort_by=filters.get('sort', 'newest'),
                            total_orders=total_orders,
                            pending_orders=pending_orders,
                            total_users=total_users,
                            total_products=total_products,
                            total_revenue=total_revenue)
 
+@admin_bp.route('/api/products')
+@login_required
+def api_products():
+    """The dashboard product table, one page at a time, for the virtualized table."""
+    if _is_orders_only():
+        return jsonify({'error': 'forbidden'}), 403
+
+    products, next_cursor, total, _ = _admin_products_page()
+    return jsonify({
+        'items': [_admin_product_row(p) for p in products],
+        'next_cursor': next_cursor,
+        'total': total,
+    })
+
+ADMIN_SEARCH_LIMIT = 20
+
+
+def _can(permission_name):
+    return getattr(current_user, 'role', 'customer') == 'admin' or getattr(current_user, permission_name, False)
+
+@admin_bp.route('/search')
+@login_required
+def search():
+    """One search box over products, orders and users, limited to what the user may manage."""
+    q = request.args.get('q', '').strip()
+    results = {}
+    if q:
+        if _can('can_manage_products'):
+            results['products'] = products_for_admin().filter(substring_match('product', q)) \
+                .order_by(Product.name, Product.id).limit(ADMIN_SEARCH_LIMIT).all()
+        if _can('can_manage_orders'):
+            results['orders'] = Order.query.filter(substring_match('order', q)) \
+                .order_by(Order.created_at.desc(), Order.id.desc()).limit(ADMIN_SEARCH_LIMIT).all()
+        if _can('can_manage_users'):
+            results['users'] = User.query.filter(substring_match('user', q)) \
+                .order_by(User.username, User.id).limit(ADMIN_SEARCH_LIMIT).all()
+    return render_template('admin/search.html', q=q, results=results, limit=ADMIN_SEARCH_LIMIT)
+
+@admin_bp.route('/reports/revenue')
+@login_required
+@permission_required('can_manage_orders')
+def revenue():
+    days = request.args.get('days', REPORT_DAYS, type=int)
+    days = min(max(days, 1), 366)
+    return render_template('admin/revenue_report.html', report=revenue_report(days), days=days)
+
 @admin_bp.route('/logs')
 @login_required
 @permission_required('can_manage_users')
 def logs():
-    logs = UserLog.query.order_by(UserLog.timestamp.desc()).limit(100).all()
+    logs = logs_with_users().order_by(UserLog.timestamp.desc()).limit(100).all()
     return render_template('admin/logs.html', logs=logs)
 
 @admin_bp.route('/orders')
 @login_required
 @permission_required('can_manage_orders')
 def orders():
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    return render_template('admin/orders.html', orders=orders)
+    orders, next_cursor, filters = _orders_page()
+    next_url = url_for('admin.orders', after=next_cursor, **filters) if next_cursor else None
+    status_counts = {status: count for status, (count, _) in orders_by_status().items()}
+    other_filters = {key: value for key, value in filters.items() if key != 'status'}
+    return render_template('admin/orders.html', orders=orders, filters=filters, other_filters=other_filters,
+                           next_url=next_url, is_first_page=not request.args.get('after'),
+                           status_counts=status_counts, statuses=ORDER_STATUSES)
+
+ORDER_STATUSES = ('Pending', 'Completed', 'Cancelled')
+ORDERS_PER_PAGE = 50
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _orders_page():
+    """
+    Resolves the order list query string (status, date_from, date_to, city, q,
+    after) to one page of orders, newest first. Returns (orders, next_cursor,
+    filters). Pages seek on (created_at, id), which the (status, created_at, id)
+    and (created_at, id) indexes serve with or without a status filter.
+    """
+    filters = {key: request.args.get(key, '').strip() for key in ('status', 'date_from', 'date_to', 'city', 'q')}
+    filters = {key: value for key, value in filters.items() if value}
+
+    query = Order.query
+    if filters.get('status') in ORDER_STATUSES:
+        query = query.filter(Order.status == filters['status'])
+
+    date_from = _parse_day(filters.get('date_from'))
+    if date_from:
+        query = query.filter(Order.created_at >= date_from)
+    date_to = _parse_day(filters.get('date_to'))
+    if date_to:
+        query = query.filter(Order.created_at < date_to + timedelta(days=1))
+
+    if filters.get('city'):
+        query = query.filter(func.lower(Order.customer_city) == filters['city'].lower())
+
+    q = filters.get('q')
+    if q:
+        phone = normalize_phone(q)
+        if phone.lstrip('+').isdigit():
+            # Phone prefix as a range on the normalized column, so its index is used
+            query = query.filter(Order.customer_phone_normalized >= phone,
+                                 Order.customer_phone_normalized < phone[:-1] + chr(ord(phone[-1]) + 1))
+        else:
+            query = query.filter(substring_match('order', q))
+
+    cursor = decode_cursor(request.args.get('after'))
+    after_date = after_id = None
+    if cursor and len(cursor) == 2 and isinstance(cursor[1], int):
+        after_date = _parse_timestamp(cursor[0])
+        if after_date is not None or cursor[0] is None:
+            after_id = cursor[1]
+
+    # Orders without a created_at (older rows) come last on every database, paged
+    # on the id alone once the dated ones run out. Both seeks run as one statement.
+    dated = query.filter(Order.created_at.isnot(None))
+    if after_id is not None:
+        dated = dated.filter(tuple_(Order.created_at, Order.id) < (after_date, after_id)
+                             if after_date is not None else false())
+    undated = query.filter(Order.created_at.is_(None))
+    if after_id is not None and after_date is None:
+        undated = undated.filter(Order.id < after_id)
+
+    pages = union_all(
+        db.select(dated.order_by(Order.created_at.desc(), Order.id.desc()).limit(ORDERS_PER_PAGE + 1).subquery()),
+        db.select(undated.order_by(Order.id.desc()).limit(ORDERS_PER_PAGE + 1).subquery()),
+    ).subquery()
+    rows = db.session.execute(db.select(Order).from_statement(
+        db.select(pages).order_by(pages.c.created_at.is_(None), pages.c.created_at.desc(), pages.c.id.desc())
+        .limit(ORDERS_PER_PAGE + 1)
+    )).scalars().all()
+
+    next_cursor = None
+    if len(rows) > ORDERS_PER_PAGE:
+        rows = rows[:ORDERS_PER_PAGE]
+        last = rows[-1]
+        next_cursor = encode_cursor([last.created_at.isoformat() if last.created_at else None, last.id])
+    return rows, next_cursor, filters
 
 @admin_bp.route('/orders/<int:order_id>')
 @login_required
 @permission_required('can_manage_orders')
 def order_detail(order_id):
-    order = Order.query.get_or_404(order_id)
+    order = order_with_items(order_id)
     return render_template('admin/order_detail.html', order=order)
 
 @admin_bp.route('/orders/<int:order_id>/confirm', methods=['POST'])
@@ -327,7 +478,11 @@ def order_detail(order_id):
 def confirm_order(order_id):
     order = Order.query.get_or_404(order_id)
     if order.status != 'Completed':
+        old_status = order.status
         order.status = 'Completed'
+        record_status_change(order, old_status)
+        # Completed orders feed the co-purchase matrix behind recommendations
+        record_order(order, 1)
         db.session.commit()
         flash(get_trans('msg_order_confirmed'), 'success')
     return redirect(url_for('admin.order_detail', order_id=order.id))
@@ -338,7 +493,11 @@ def confirm_order(order_id):
 def cancel_order(order_id):
     order = Order.query.get_or_404(order_id)
     if order.status != 'Cancelled':
+        old_status = order.status
+        if old_status == 'Completed':
+            record_order(order, -1)
         order.status = 'Cancelled'
+        record_status_change(order, old_status)
         db.session.commit()
         flash(get_trans('msg_order_cancelled'), 'warning')
     return redirect(url_for('admin.order_detail', order_id=order.id))
@@ -368,6 +527,7 @@ def add_category():
         else:
             category = Category(name=name, image_url=image_url)
             db.session.add(category)
+            bump_catalog_version()
             db.session.commit()
             flash(get_trans('msg_cat_added'), 'success')
             return redirect(url_for('admin.categories'))
@@ -392,6 +552,7 @@ def edit_category(id):
                 return render_template('admin/category_form.html', title='Edit Category', category=category)
             category.name = new_name
 
+        bump_catalog_version()
         db.session.commit()
         flash(get_trans('msg_cat_updated'), 'success')
         return redirect(url_for('admin.categories'))
@@ -408,6 +569,7 @@ def delete_category(id):
         flash(get_trans('msg_cat_delete_error'), 'danger')
     else:
         db.session.delete(category)
+        bump_catalog_version()
         db.session.commit()
         flash(get_trans('msg_cat_deleted'), 'success')
     return redirect(url_for('admin.categories'))
@@ -477,6 +639,7 @@ def add_product():
                 )
                 db.session.add(new_pricing)
 
+        bump_catalog_version()
         db.session.commit()
 
         flash(get_trans('msg_product_added'), 'success')
@@ -488,7 +651,7 @@ def add_product():
 @login_required
 @permission_required('can_edit_product')
 def edit_product(product_id):
-    product = Product.query.get_or_404(product_id)
+    product = product_for_edit(product_id)
     categories = db.session.execute(db.select(Category)).scalars().all()
 
     if request.method == 'POST':
@@ -534,6 +697,7 @@ def edit_product(product_id):
                 )
                 db.session.add(new_pricing)
 
+        bump_catalog_version()
         db.session.commit()
         flash(get_trans('msg_product_updated'), 'success')
         return redirect(url_for('admin.dashboard'))
@@ -546,6 +710,7 @@ def edit_product(product_id):
 def delete_product(product_id):
     product = Product.query.get_or_404(product_id)
     db.session.delete(product)
+    bump_catalog_version()
     db.session.commit()
     flash(get_trans('msg_product_deleted'), 'success')
     return redirect(url_for('admin.dashboard'))
@@ -556,6 +721,7 @@ def delete_product(product_id):
 def toggle_hidden(product_id):
     product = Product.query.get_or_404(product_id)
     product.is_hidden = not product.is_hidden
+    bump_catalog_version()
     db.session.commit()
     status = get_trans('status_hidden') if product.is_hidden else get_trans('status_visible')
     flash(get_trans('msg_product_status').format(name=product.name, status=status), 'success')
@@ -567,6 +733,7 @@ def toggle_hidden(product_id):
 def toggle_stock(product_id):
     product = Product.query.get_or_404(product_id)
     product.is_out_of_stock = not product.is_out_of_stock
+    bump_catalog_version()
     db.session.commit()
     status = get_trans('status_out_of_stock') if product.is_out_of_stock else get_trans('status_in_stock')
     flash(get_trans('msg_product_status').format(name=product.name, status=status), 'success')
@@ -580,23 +747,20 @@ def home_settings():
     target_sections = ['hero_slide_1', 'hero_slide_2', 'hero_slide_3', 'limited_offer']
     sections = {}
 
-    # Fetch or Create
+    # Fetch or Create (one query for all managed sections)
+    existing = {s.section_name: s for s in HomeSection.query.filter(HomeSection.section_name.in_(target_sections)).all()}
     for name in target_sections:
-        s = HomeSection.query.filter_by(section_name=name).first()
+        s = existing.get(name)
         if not s:
             s = HomeSection(section_name=name)
             db.session.add(s)
         sections[name] = s
 
     # Fetch Global Settings
-    free_shipping_setting = SiteSetting.query.filter_by(key='free_shipping_threshold').first()
-    free_shipping_threshold = free_shipping_setting.value if free_shipping_setting else '500'
-
-    shipping_cost_setting = SiteSetting.query.filter_by(key='shipping_cost').first()
-    shipping_cost = shipping_cost_setting.value if shipping_cost_setting else '35'
-
-    meta_pixel_id_setting = SiteSetting.query.filter_by(key='meta_pixel_id').first()
-    meta_pixel_id = meta_pixel_id_setting.value if meta_pixel_id_setting else ''
+    settings = get_settings()
+    free_shipping_threshold = settings['free_shipping_threshold']
+    shipping_cost = settings['shipping_cost']
+    meta_pixel_id = settings['meta_pixel_id']
 
     # Commit any new sections
     if db.session.dirty or db.session.new:
@@ -636,27 +800,21 @@ def home_settings():
                 if file and allowed_file(file.filename):
                     section.image_url = optimize_and_save_image(file)
 
-        # Update Global Settings
+        # Home sections are part of the catalog snapshot
+        bump_catalog_version()
+
+        # Update Global Settings (bumps the settings version so every worker reloads them)
         threshold_val = request.form.get('free_shipping_threshold')
         if threshold_val:
-            if not free_shipping_setting:
-                free_shipping_setting = SiteSetting(key='free_shipping_threshold')
-                db.session.add(free_shipping_setting)
-            free_shipping_setting.value = threshold_val
+            set_setting('free_shipping_threshold', threshold_val)
 
         shipping_cost_val = request.form.get('shipping_cost')
         if shipping_cost_val:
-            if not shipping_cost_setting:
-                shipping_cost_setting = SiteSetting(key='shipping_cost')
-                db.session.add(shipping_cost_setting)
-            shipping_cost_setting.value = shipping_cost_val
+            set_setting('shipping_cost', shipping_cost_val)
 
         meta_pixel_id_val = request.form.get('meta_pixel_id')
         if meta_pixel_id_val is not None:
-            if not meta_pixel_id_setting:
-                meta_pixel_id_setting = SiteSetting(key='meta_pixel_id')
-                db.session.add(meta_pixel_id_setting)
-            meta_pixel_id_setting.value = meta_pixel_id_val
+            set_setting('meta_pixel_id', meta_pixel_id_val)
 
         db.session.commit()
         flash(get_trans('msg_settings_updated'), 'success')
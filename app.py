@@ -3,16 +3,23 @@ import sys
 import logging
 import traceback
 from dotenv import load_dotenv
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 
 load_dotenv()
-from flask import Flask, session, request, send_from_directory, jsonify
+from flask import Flask, request, send_from_directory, jsonify
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
-from models import db, User, Category, SiteSetting
+from models import db, User
 from translations import translations
+from catalog import get_catalog
+from pricing import get_cart_quote
+from settings import SETTINGS, get_setting
+from lazy_context import lazy_value, init_context_instrumentation
+from page_cache import init_page_cache
+from conditional import init_conditional_requests
+from page_shell import init_page_shell, current_lang, is_shell_request
+from prefork import init_template_cache
+from audit_log import init_audit_log
+from commands import register_commands
 
 def create_app(test_config=None):
     app = Flask(__name__)
@@ -35,14 +42,6 @@ def create_app(test_config=None):
 
     app.logger.info(f"Application starting... Environment: {'Production' if not app.debug else 'Debug'}")
 
-    # Cloudinary Config
-    cloudinary.config(
-        cloud_name=os.environ.get('CLOUDINARY_CLOUD_NAME'),
-        api_key=os.environ.get('CLOUDINARY_API_KEY'),
-        api_secret=os.environ.get('CLOUDINARY_API_SECRET'),
-        secure=True
-    )
-
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-luxfakia')
 
     # Database configuration
@@ -53,8 +52,35 @@ def create_app(test_config=None):
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url or 'sqlite:///luxfakia.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Storefront pages as shared-cacheable shells (see page_shell.py)
+    app.config['SHELL_MODE'] = os.environ.get('SHELL_MODE', '').lower() in ('1', 'true', 'yes')
+
+    # Anonymous full-page cache (see page_cache.py): 'memory', 'filesystem' or 'redis'
+    app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND')
+    if os.environ.get('PAGE_CACHE_DIR'):
+        app.config['PAGE_CACHE_DIR'] = os.environ['PAGE_CACHE_DIR']
+    if os.environ.get('PAGE_CACHE_REDIS_URL'):
+        app.config['PAGE_CACHE_REDIS_URL'] = os.environ['PAGE_CACHE_REDIS_URL']
+
+    # Apply pending schema migrations at boot instead of through `flask db-upgrade`.
+    # On by default for SQLite only, where there is no release phase to run them.
+    if os.environ.get('AUTO_MIGRATE'):
+        app.config['AUTO_MIGRATE'] = os.environ['AUTO_MIGRATE'].lower() in ('1', 'true', 'yes')
+
+    # Compiled templates kept on disk across worker restarts and deploys, filled at
+    # build time by `flask precompile-templates` (see prefork.py). Off in tests.
+    if os.environ.get('TEMPLATE_CACHE_DIR'):
+        app.config['TEMPLATE_CACHE_DIR'] = os.environ['TEMPLATE_CACHE_DIR']
+
+    # UserLog rows written in batches by a background thread (see audit_log.py). Off in tests.
+    if os.environ.get('AUDIT_LOG_ASYNC'):
+        app.config['AUDIT_LOG_ASYNC'] = os.environ['AUDIT_LOG_ASYNC'].lower() in ('1', 'true', 'yes')
+
     if test_config:
         app.config.update(test_config)
+    app.config.setdefault('AUTO_MIGRATE', app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'))
+    app.config.setdefault('AUDIT_LOG_ASYNC', not app.testing)
+    app.config.setdefault('TEMPLATE_CACHE_DIR', None if app.testing else os.path.join(app.instance_path, 'jinja_cache'))
 
     # Initialize extensions
     csrf = CSRFProtect()
@@ -98,6 +124,13 @@ def create_app(test_config=None):
     app.register_blueprint(admin_bp)
     app.register_blueprint(auth_bp)
 
+    init_page_shell(app)
+    init_conditional_requests(app)
+    init_page_cache(app)
+    init_template_cache(app)
+    init_audit_log(app)
+    register_commands(app)
+
     @app.template_filter('optimize_image')
     def optimize_image_filter(url):
         if not url:
@@ -106,114 +139,79 @@ def create_app(test_config=None):
             return url.replace('/upload/', '/upload/f_auto,q_auto/')
         return url
 
+    init_context_instrumentation(app)
+
     @app.context_processor
     def inject_global_context():
-        lang = session.get('lang', 'fr')
-        if lang == 'en':
-            lang = 'fr'
-            session['lang'] = 'fr'
+        lang = current_lang()
+        shell_mode = is_shell_request()
 
         def get_text(key):
             # Fallback to key if translation missing, or fallback to FR/EN if needed?
             # Ideally fallback to English or the key itself.
             return translations.get(lang, {}).get(key, key)
 
-        try:
-            categories = Category.query.all()
-        except Exception:
-            categories = []
-
-        # Fetch free shipping threshold and shipping cost
-        try:
-            threshold_setting = SiteSetting.query.filter_by(key='free_shipping_threshold').first()
-            free_shipping_threshold = float(threshold_setting.value) if threshold_setting and threshold_setting.value else 500.0
-
-            shipping_cost_setting = SiteSetting.query.filter_by(key='shipping_cost').first()
-            shipping_cost = float(shipping_cost_setting.value) if shipping_cost_setting and shipping_cost_setting.value else 35.0
-
-            meta_pixel_id_setting = SiteSetting.query.filter_by(key='meta_pixel_id').first()
-            meta_pixel_id = meta_pixel_id_setting.value if meta_pixel_id_setting and meta_pixel_id_setting.value else '1626031432043896'
-        except Exception:
-            free_shipping_threshold = 500.0
-            shipping_cost = 35.0
-            meta_pixel_id = '1626031432043896'
+        # Everything below is computed on first use in a template (see lazy_context.py),
+        # so pages without the navbar or the shipping banner skip the queries entirely.
+        def categories():
+            try:
+                return get_catalog().categories
+            except Exception:
+                return []
 
-        # Calculate cart total for free shipping banner
-        cart_total = 0
-        remaining_amount = free_shipping_threshold
-        cart = session.get('cart', {})
+        def setting(key):
+            try:
+                return get_setting(key)
+            except Exception:
+                return SETTINGS[key][1]
 
-        if cart:
+        def cart_quote():
+            # Memoized per request by get_cart_quote (see pricing.py)
             try:
-                product_ids = [int(pid) for pid in cart.keys()]
-                if product_ids:
-                    from models import Product
-                    products = Product.query.filter(Product.id.in_(product_ids)).all()
-                    product_map = {p.id: p for p in products}
-
-                    for pid_str, quantity in cart.items():
-                        pid = int(pid_str)
-                        if pid in product_map:
-                            product = product_map[pid]
-                            # Default price logic (simplified vs exact route logic, but close enough for banner)
-                            # Or replicate exact logic
-                            price = product.price * quantity # Base total
-
-                            # Check pricing tiers for override
-                            found_tier = False
-                            for pricing in product.pricings:
-                                if pricing.quantity == quantity:
-                                    price = pricing.price
-                                    found_tier = True
-                                    break
-
-                            cart_total += price
+                return get_cart_quote()
             except Exception as e:
                 app.logger.error(f"Error calculating cart total: {e}")
+                return None
 
-        remaining_amount = max(0, free_shipping_threshold - cart_total)
-        shipping_fee = 0 if cart_total >= free_shipping_threshold else shipping_cost
+        def cart_total():
+            quote = cart_quote()
+            return quote.subtotal if quote else 0
 
-        return dict(
+        def remaining_amount():
+            quote = cart_quote()
+            return quote.remaining_amount if quote else setting('free_shipping_threshold')
+
+        def shipping_fee():
+            quote = cart_quote()
+            return quote.shipping_fee if quote else setting('shipping_cost')
+
+        context = dict(
             get_text=get_text,
             translations=translations,
             current_lang=lang,
             text_dir='rtl' if lang == 'ar' else 'ltr',
-            all_categories=categories,
-            cart_total=cart_total,
-            remaining_amount=remaining_amount,
-            free_shipping_threshold=free_shipping_threshold,
-            shipping_cost=shipping_cost,
-            shipping_fee=shipping_fee,
-            meta_pixel_id=meta_pixel_id
+            all_categories=lazy_value('all_categories', categories),
+            cart_total=lazy_value('cart_total', cart_total),
+            remaining_amount=lazy_value('remaining_amount', remaining_amount),
+            free_shipping_threshold=lazy_value('free_shipping_threshold', lambda: setting('free_shipping_threshold')),
+            shipping_cost=lazy_value('shipping_cost', lambda: setting('shipping_cost')),
+            shipping_fee=lazy_value('shipping_fee', shipping_fee),
+            meta_pixel_id=lazy_value('meta_pixel_id', lambda: setting('meta_pixel_id'))
         )
+        context['shell_mode'] = shell_mode
+        if shell_mode:
+            # The token is per session; shell pages receive it from /api/session-summary
+            context['csrf_token'] = lambda: ''
+        return context
 
+    # One ledger lookup when the schema is current (see migrations.py)
     with app.app_context():
         try:
-            db.create_all()
-
-            # Auto-fix database schema (add missing columns)
-            try:
-                from fix_db import run_db_fix
-                run_db_fix(app.config['SQLALCHEMY_DATABASE_URI'])
-            except Exception as e:
-                app.logger.error(f"Database schema fix failed: {e}")
-
-            # Ensure Meta Pixel ID is set
-            try:
-                meta_pixel_id_setting = SiteSetting.query.filter_by(key='meta_pixel_id').first()
-                if not meta_pixel_id_setting:
-                    meta_pixel_id_setting = SiteSetting(key='meta_pixel_id', value='1626031432043896')
-                    db.session.add(meta_pixel_id_setting)
-                else:
-                    meta_pixel_id_setting.value = '1626031432043896'
-                db.session.commit()
-            except Exception as e:
-                app.logger.error(f"Failed to set Meta Pixel ID: {e}")
-
+            from migrations import check_schema
+            check_schema(auto_migrate=app.config['AUTO_MIGRATE'])
         except Exception as e:
-            app.logger.error(f"Database connection failed: {e}")
-            print(f"CRITICAL ERROR: Database connection failed: {e}", file=sys.stderr)
+            app.logger.error(f"Database schema check failed: {e}")
+            print(f"CRITICAL ERROR: Database schema check failed: {e}", file=sys.stderr)
             # We do NOT re-raise, so the app can start and serve /health
 
     return app
@@ -0,0 +1,172 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from flask import current_app, request, has_request_context
+from sqlalchemy import insert, event as orm_event
+from sqlalchemy.orm import Session
+from models import db, UserLog
+
+# UserLog rows (logins, checkouts) are written off the request path. Requests
+# put events on a per-worker queue; a background thread inserts them in batches,
+# one multi-row INSERT and one commit per batch, at most every
+# AUDIT_LOG_FLUSH_MS milliseconds or AUDIT_LOG_BATCH_SIZE events, whichever
+# comes first. Pending events are flushed when the worker exits. Events logged
+# as part of the caller's own unit of work (commit=False) are only queued once
+# that commit succeeds, and dropped if it is rolled back.
+#
+# With AUDIT_LOG_ASYNC off (the default under TESTING) rows are added to the
+# request's session instead, as before.
+
+FLUSH_MS = 500
+BATCH_SIZE = 100
+MAX_PENDING = 10000
+
+_STOP = object()
+
+
+class AuditLogWriter:
+    def __init__(self, app, flush_ms=FLUSH_MS, batch_size=BATCH_SIZE, max_pending=MAX_PENDING):
+        self.app = app
+        self.interval = flush_ms / 1000.0
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def submit(self, event):
+        """Queues one UserLog row (a dict of column values). Never blocks the request."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # A flood (e.g. brute-force logins) must not grow memory without bound
+            if not self.dropped:
+                self.app.logger.warning(f"Audit log queue full ({self.max_pending} events), dropping events")
+            self.dropped += 1
+
+    def close(self, timeout=5):
+        """Writes the pending events and stops the thread."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _ensure_started(self):
+        # Started on first use in each process: a thread started in the gunicorn
+        # master would not survive the fork.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(self.max_pending)
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self):
+        """
+        Waits for an event, then collects more until the batch is full or the
+        interval since that first event has passed. Returns (batch, stop requested).
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = self.interval if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                event = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                if batch:
+                    break
+                continue
+            if event is _STOP:
+                return batch, True
+            batch.append(event)
+            if deadline is None:
+                deadline = time.monotonic() + self.interval
+        return batch, False
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(UserLog), batch)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f"Audit log write failed, {len(batch)} events lost: {e}")
+            finally:
+                db.session.remove()
+
+
+def init_audit_log(app):
+    if not app.config.get('AUDIT_LOG_ASYNC'):
+        return
+    writer = AuditLogWriter(
+        app,
+        flush_ms=app.config.get('AUDIT_LOG_FLUSH_MS', FLUSH_MS),
+        batch_size=app.config.get('AUDIT_LOG_BATCH_SIZE', BATCH_SIZE),
+    )
+    app.extensions['audit_log'] = writer
+    atexit.register(writer.close)
+
+
+def close_audit_log(app):
+    writer = app.extensions.get('audit_log')
+    if writer is not None:
+        writer.close()
+
+
+_DEFERRED = 'audit_log_deferred'
+
+
+@orm_event.listens_for(Session, 'after_commit')
+def _submit_deferred(session):
+    for writer, event in session.info.pop(_DEFERRED, ()):
+        writer.submit(event)
+
+
+@orm_event.listens_for(Session, 'after_rollback')
+def _drop_deferred(session):
+    session.info.pop(_DEFERRED, None)
+
+
+def log_event(action, details=None, user_id=None, commit=True):
+    """
+    Records a UserLog row for the current request. Queued when the writer runs;
+    otherwise added to the session and committed. With `commit` False the
+    caller's own commit follows: the row joins it, or is queued once it succeeds.
+    """
+    event = {
+        'user_id': user_id,
+        'action': action,
+        'details': details,
+        'ip_address': request.remote_addr if has_request_context() else None,
+        'timestamp': datetime.utcnow(),
+    }
+    writer = current_app.extensions.get('audit_log')
+    if writer is not None:
+        if commit:
+            writer.submit(event)
+        else:
+            db.session.info.setdefault(_DEFERRED, []).append((writer, event))
+        return
+
+    db.session.add(UserLog(**event))
+    if commit:
+        db.session.commit()
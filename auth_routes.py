@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, User
 from translations import get_trans
+from audit_log import log_event
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -23,15 +24,7 @@ def login():
             login_user(user)
 
             # Log Login Success
-            from models import UserLog
-            log = UserLog(
-                user_id=user.id,
-                action='Login Successful',
-                ip_address=request.remote_addr,
-                details=f"User {user.username} logged in."
-            )
-            db.session.add(log)
-            db.session.commit()
+            log_event('Login Successful', f"User {user.username} logged in.", user_id=user.id)
 
             flash(get_trans('msg_login_success'), 'success')
 
@@ -44,15 +37,7 @@ def login():
             return redirect(url_for('main.index'))
         else:
             # Log Login Failure
-            from models import UserLog
-            log = UserLog(
-                user_id=None,
-                action='Login Failed',
-                ip_address=request.remote_addr,
-                details=f"Failed login attempt for username/email: {username_or_email}"
-            )
-            db.session.add(log)
-            db.session.commit()
+            log_event('Login Failed', f"Failed login attempt for username/email: {username_or_email}")
 
             flash(get_trans('msg_login_fail'), 'danger')
 
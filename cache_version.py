@@ -0,0 +1,105 @@
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import cast, Integer, String
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, SiteSetting
+from request_memo import memoized, forget
+
+# Shared counters stored in SiteSetting as '<name>_version'. Every worker reads
+# them to decide whether its in-process caches are still current. For the
+# counters behind page content (Last-Modified, see conditional.py) the time of
+# the last bump is kept next to it as '<name>_version_at' (epoch seconds).
+VERSION_KEYS = ('catalog_version', 'settings_version', 'recommendations_version')
+STAMPED_VERSIONS = ('catalog', 'settings')
+_STAMP_KEYS = tuple(f'{name}_version_at' for name in STAMPED_VERSIONS)
+_KEYS = VERSION_KEYS + _STAMP_KEYS
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _state():
+    return current_app.extensions.setdefault('cache_versions', {'values': {}, 'checked_at': None})
+
+
+def _current_values():
+    """
+    All counters, read in one query at most once every CACHE_VERSION_TTL seconds.
+    A request sees the same values throughout, however many caches consult them.
+    """
+    return memoized('cache_versions', _read_values)
+
+
+def _read_values():
+    state = _state()
+    ttl = current_app.config.get('CACHE_VERSION_TTL', 1.0)
+    now = time.monotonic()
+
+    if state['checked_at'] is None or now - state['checked_at'] >= ttl:
+        rows = SiteSetting.query.filter(SiteSetting.key.in_(_KEYS)).all()
+        state['values'] = {row.key: _to_int(row.value) for row in rows}
+        state['checked_at'] = now
+
+    return state['values']
+
+
+def get_version(name):
+    """Returns the current value of the shared version counter `name`."""
+    return _current_values().get(f'{name}_version', 0)
+
+
+def get_versions(*names):
+    """Returns several counters from the same read, so they are consistent with each other."""
+    values = _current_values()
+    return tuple(values.get(f'{name}_version', 0) for name in names)
+
+
+def changed_at(*names):
+    """Time of the latest bump of any of the STAMPED_VERSIONS `names`, or None if none was recorded."""
+    values = _current_values()
+    stamps = [values.get(f'{name}_version_at', 0) for name in names]
+    return datetime.utcfromtimestamp(max(stamps)) if any(stamps) else None
+
+
+def _setting(key, default):
+    setting = SiteSetting.query.filter_by(key=key).first()
+    if not setting:
+        setting = SiteSetting(key=key, value=default)
+        db.session.add(setting)
+    return setting
+
+
+def bump_version(name):
+    """
+    Increments the shared counter `name` in the current transaction, records
+    when for STAMPED_VERSIONS, and returns its new value. The caller commits; the local copy is expired so
+    the next read sees the new value.
+    """
+    key = f'{name}_version'
+    # One INSERT ... ON CONFLICT DO UPDATE ... RETURNING: the database does the
+    # increment, so two concurrent bumps always get two different versions
+    dialect = db.session.get_bind().dialect.name
+    upsert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    stmt = upsert(SiteSetting).values(key=key, value='1')
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['key'],
+        set_={'value': cast(cast(SiteSetting.value, Integer) + 1, String)}
+    ).returning(SiteSetting.value)
+    version = _to_int(db.session.execute(stmt).scalar())
+
+    if name in STAMPED_VERSIONS:
+        # Whole seconds, like Last-Modified, and later than the other stamped
+        # counters so that two bumps within the same second still yield different dates
+        stamp = _setting(f'{key}_at', '0')
+        stamps = SiteSetting.query.filter(SiteSetting.key.in_(_STAMP_KEYS)).all()
+        latest = max((_to_int(s.value) for s in stamps), default=0)
+        stamp.value = str(max(int(time.time()), latest + 1))
+
+    _state()['checked_at'] = None
+    forget('cache_versions')
+    return version
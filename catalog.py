@@ -0,0 +1,331 @@
+import json
+import base64
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import tuple_, func
+from models import db, Product, Category, HomeSection, resolve_display_image_url
+from cache_version import get_versions, bump_version
+from pricing import build_tier_index
+from queries import products_with_pricings
+from request_memo import memoized, forget
+from recommendations import (copurchase_counts, build_bought_together, build_related_index, recommend_for,
+                             changed_since)
+from sales import best_seller_ids, COLLECTION_SIZE
+
+_rebuild_lock = threading.Lock()
+
+
+class CatalogCategory:
+    """Read-only copy of a Category row, safe to share between requests."""
+    __slots__ = ('id', 'name', 'image_url')
+
+    def __init__(self, category):
+        self.id = category.id
+        self.name = category.name
+        self.image_url = category.image_url
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'image_url': self.image_url
+        }
+
+
+class CatalogPricing:
+    __slots__ = ('quantity', 'price', 'display_unit')
+
+    def __init__(self, pricing):
+        self.quantity = pricing.quantity
+        self.price = pricing.price
+        self.display_unit = pricing.display_unit
+
+    def to_dict(self):
+        return {
+            'quantity': self.quantity,
+            'price': self.price,
+            'display_unit': self.display_unit
+        }
+
+
+class CatalogProduct:
+    """Read-only copy of a Product with its pricings and category already attached."""
+    __slots__ = ('id', 'name', 'description', 'price', 'unit', 'category_id', 'category',
+                 'image_url', 'is_hidden', 'is_out_of_stock', 'pricings', 'display_image_url', 'tier_prices',
+                 'created_at')
+
+    def __init__(self, product, category):
+        self.id = product.id
+        self.name = product.name
+        self.description = product.description
+        self.price = product.price
+        self.unit = product.unit
+        self.category_id = product.category_id
+        self.category = category
+        self.image_url = product.image_url
+        self.is_hidden = bool(product.is_hidden)
+        self.is_out_of_stock = bool(product.is_out_of_stock)
+        self.created_at = product.created_at
+        self.pricings = [CatalogPricing(p) for p in product.pricings]
+        self.tier_prices = build_tier_index(self.pricings)
+        self.display_image_url = resolve_display_image_url(self.image_url, category.name if category else None)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'price': self.price,
+            'unit': self.unit,
+            'category': self.category.name if self.category else None,
+            'image_url': self.image_url,
+            'is_hidden': self.is_hidden,
+            'is_out_of_stock': self.is_out_of_stock,
+            'pricings': [p.to_dict() for p in self.pricings]
+        }
+
+
+class CatalogHomeSection:
+    """Read-only copy of a HomeSection (hero slides, limited offer)."""
+    __slots__ = ('section_name', 'title_fr', 'title_ar', 'title_en', 'text_fr', 'text_ar', 'text_en',
+                 'image_url', 'end_date', 'is_active')
+
+    def __init__(self, section):
+        for name in self.__slots__:
+            setattr(self, name, getattr(section, name))
+
+
+class CatalogSnapshot:
+    """All categories and products of one catalog version, indexed for the storefront."""
+
+    def __init__(self, version, categories, products, home_sections=None,
+                 related=None, bought_together=None, best_sellers=None, recommendations_version=0):
+        self.version = version
+        # The recommendation lists below are refreshed in place when this moves
+        self.recommendations_version = recommendations_version
+        # The best-seller window ends today, so the snapshot is also reloaded daily
+        self.loaded_on = datetime.utcnow().date()
+        self.categories = categories
+        # product id -> ids of visible, in-stock recommendations (see recommendations.py)
+        self.related = related or {}
+        # product id -> top-k [(other id, orders)] from the co-purchase matrix
+        self.bought_together = bought_together or {}
+        self.home_sections = {s.section_name: s for s in home_sections or []}
+        self.by_id = {p.id: p for p in products}
+        # Hidden products stay addressable by id (cart, direct links) but are never listed
+        self.products = [p for p in products if not p.is_hidden]
+
+        self._by_category = {}
+        for product in self.products:
+            if product.category:
+                self._by_category.setdefault(product.category.name, []).append(product)
+
+        # Home page collections: only listed, in-stock products
+        listed = [p for p in self.products if not p.is_out_of_stock]
+        listed_ids = {p.id for p in listed}
+        self.best_sellers = [self.by_id[pid] for pid in best_sellers or () if pid in listed_ids][:COLLECTION_SIZE]
+        newest = sorted(listed, key=lambda p: (p.created_at or datetime.min, p.id), reverse=True)
+        self.new_arrivals = newest[:COLLECTION_SIZE]
+
+    def get_product(self, product_id):
+        return self.by_id.get(product_id)
+
+    def products_in_category(self, category_name):
+        return self._by_category.get(category_name, [])
+
+    def related_products(self, product_id):
+        return [self.by_id[pid] for pid in self.related.get(product_id, ())]
+
+    def bought_with(self, product_ids, limit=3):
+        return [self.by_id[pid] for pid in recommend_for(self.bought_together, product_ids, limit)]
+
+    def refresh_recommendations(self, recommendations_version):
+        """
+        Recomputes the bought-together and related lists of the products whose
+        co-purchase counts changed since the snapshot's recommendations version,
+        or all of them when the change log does not reach back that far.
+        """
+        products = list(self.by_id.values())
+        available = {p.id for p in self.products if not p.is_out_of_stock}
+        changed = changed_since(self.recommendations_version)
+
+        if changed is None:
+            bought_together = build_bought_together(copurchase_counts(), available)
+            related = build_related_index(products, bought_together)
+        else:
+            bought_together = {pid: top for pid, top in self.bought_together.items() if pid not in changed}
+            bought_together.update(build_bought_together(copurchase_counts(changed), available))
+            related = dict(self.related)
+            related.update(build_related_index(products, bought_together, product_ids=changed))
+
+        # Requests in flight keep reading the previous dicts
+        self.bought_together = bought_together
+        self.related = related
+        self.recommendations_version = recommendations_version
+
+
+def load_snapshot(version, recommendations_version=0):
+    """
+    Builds a snapshot with six queries: categories, products, their pricings,
+    home sections, the co-purchase matrix behind the recommendations and the
+    best sellers from the sales rollup.
+    """
+    category_rows = Category.query.order_by(Category.id).all()
+    categories = [CatalogCategory(c) for c in category_rows]
+    category_map = {c.id: c for c in categories}
+
+    rows = products_with_pricings().order_by(Product.id).all()
+    products = [CatalogProduct(p, category_map.get(p.category_id)) for p in rows]
+
+    section_rows = HomeSection.query.all()
+    home_sections = [CatalogHomeSection(s) for s in section_rows]
+
+    available = {p.id for p in products if not p.is_hidden and not p.is_out_of_stock}
+    bought_together = build_bought_together(copurchase_counts(), available)
+    related = build_related_index(products, bought_together)
+
+    # Over-fetch: some best sellers may be hidden or out of stock by now
+    best_sellers = best_seller_ids(limit=COLLECTION_SIZE * 3)
+
+    return CatalogSnapshot(version, categories, products, home_sections,
+                           related, bought_together, best_sellers, recommendations_version)
+
+
+def get_catalog():
+    """
+    Returns the catalog snapshot of the current worker, rebuilding it only when
+    the shared catalog version has moved since it was loaded. A new
+    recommendations version only refreshes the lists of the products involved.
+    """
+    return memoized('catalog_snapshot', _current_snapshot)
+
+
+def _is_current(snapshot, version, today):
+    return snapshot is not None and snapshot.version == version and snapshot.loaded_on == today
+
+
+def _current_snapshot():
+    version, recommendations_version = get_versions('catalog', 'recommendations')
+    today = datetime.utcnow().date()
+    snapshot = current_app.extensions.get('catalog_snapshot')
+    if _is_current(snapshot, version, today) and snapshot.recommendations_version == recommendations_version:
+        return snapshot
+
+    with _rebuild_lock:
+        snapshot = current_app.extensions.get('catalog_snapshot')
+        if not _is_current(snapshot, version, today):
+            snapshot = load_snapshot(version, recommendations_version)
+            current_app.extensions['catalog_snapshot'] = snapshot
+            current_app.logger.info(f"Catalog snapshot loaded (version {version}, {len(snapshot.by_id)} products)")
+        elif snapshot.recommendations_version != recommendations_version:
+            snapshot.refresh_recommendations(recommendations_version)
+    return snapshot
+
+
+def bump_catalog_version():
+    """
+    Call before committing any write to products, pricings, categories or home
+    sections. Orders changing status go through recommendations.record_order,
+    which bumps the recommendations version instead.
+    """
+    bump_version('catalog')
+    forget('catalog_snapshot')
+
+
+# Shop listing: sort keys map to (column, descending). Every order ends on the
+# primary key so (value, id) is unique and can be used as a keyset cursor.
+SHOP_SORTS = {
+    'default': (Product.id, False),
+    'price-asc': (Product.price, False),
+    'price-desc': (Product.price, True),
+    'name-asc': (Product.name, False),
+    'newest': (Product.id, True),
+}
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _cursor_fits(column, value):
+    """True when a cursor value taken from the URL has the type of its sort column."""
+    if isinstance(value, bool):
+        return False
+    if column is Product.name:
+        return isinstance(value, str)
+    if column is Product.id:
+        return isinstance(value, int)
+    return isinstance(value, (int, float))
+
+
+def keyset_filter(column, descending, after):
+    """
+    Seek condition for the products after the cursor `after` in a (column, id)
+    ordering, or None when there is no cursor or its values do not match the sort
+    (edited, or from another sort); the first page is then returned.
+    """
+    cursor = decode_cursor(after)
+    if not (cursor and len(cursor) == 2 and _cursor_fits(column, cursor[0]) and _cursor_fits(Product.id, cursor[1])):
+        return None
+    key = tuple_(column, Product.id) if column is not Product.id else Product.id
+    value = (cursor[0], cursor[1]) if column is not Product.id else cursor[1]
+    return key < value if descending else key > value
+
+
+def keyset_order(column, descending):
+    """ORDER BY clauses matching keyset_filter."""
+    if column is Product.id:
+        return [Product.id.desc() if descending else Product.id.asc()]
+    return [column.desc(), Product.id.desc()] if descending else [column.asc(), Product.id.asc()]
+
+
+def _visible_products(query, category_id=None, condition=None):
+    query = query.filter(Product.is_hidden == False)
+    if category_id is not None:
+        query = query.filter(Product.category_id == category_id)
+    if condition is not None:
+        query = query.filter(condition)
+    return query
+
+
+def count_visible_products(category_id=None, condition=None):
+    """Number of listed products, optionally in a category and matching a SQL condition (e.g. a search)."""
+    return _visible_products(db.session.query(func.count(Product.id)), category_id, condition).scalar()
+
+
+def list_visible_product_ids(sort='default', category_id=None, condition=None, after=None, limit=24):
+    """
+    Returns (ids, next_cursor) for one page of visible products, sorted and paged in SQL.
+    Pages are fetched with a seek on (sort value, id) instead of OFFSET, so page N
+    costs the same as page 1.
+    """
+    column, descending = SHOP_SORTS.get(sort, SHOP_SORTS['default'])
+
+    query = _visible_products(db.session.query(Product.id, column), category_id, condition)
+
+    seek = keyset_filter(column, descending, after)
+    if seek is not None:
+        query = query.filter(seek)
+
+    rows = query.order_by(*keyset_order(column, descending)).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_id, last_value = rows[-1]
+        next_cursor = encode_cursor([last_value, last_id])
+
+    return [row[0] for row in rows], next_cursor
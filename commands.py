@@ -0,0 +1,135 @@
+import click
+from models import db
+
+
+def register_commands(app):
+    """Maintenance commands, run with `flask --app wsgi <command>`."""
+
+    @app.cli.command('rebuild-recommendations')
+    def rebuild_recommendations():
+        """Recompute the co-purchase matrix from all completed orders."""
+        from recommendations import rebuild_cooccurrence
+        from cache_version import bump_version
+
+        # A version with no change log entry makes every worker reload all lists
+        pairs = rebuild_cooccurrence()
+        bump_version('recommendations')
+        db.session.commit()
+        click.echo(f"Co-purchase matrix rebuilt: {pairs} pairs")
+
+    @app.cli.command('rebuild-sales')
+    def rebuild_sales():
+        """Backfill or recompute the sales rollups from the order history."""
+        from sales import rebuild_sales_rollups
+        from catalog import bump_catalog_version
+
+        counts = rebuild_sales_rollups()
+        bump_catalog_version()
+        db.session.commit()
+        for table, rows in counts.items():
+            click.echo(f"{table}: {rows} rows")
+
+    @app.cli.command('index-report')
+    def index_report():
+        """Compare the indexes in the database with models.py and show how often each is used."""
+        from sqlalchemy import text
+        from fix_db import declared_indexes
+
+        dialect = db.engine.dialect.name
+        declared = {name: table for table, name, _ in declared_indexes(dialect)}
+
+        # {index name: (table, scans, size in bytes)}; SQLite keeps no usage counters
+        if dialect == 'postgresql':
+            rows = db.session.execute(text(
+                "SELECT relname, indexrelname, idx_scan, pg_relation_size(indexrelid) "
+                "FROM pg_stat_user_indexes"
+            ))
+            present = {name: (table, scans, size) for table, name, scans, size in rows}
+        else:
+            rows = db.session.execute(text(
+                "SELECT tbl_name, name FROM sqlite_master "
+                "WHERE type = 'index' AND name NOT LIKE 'sqlite_autoindex%'"
+            ))
+            present = {name: (table, None, None) for table, name in rows}
+
+        for name in sorted(set(declared) | set(present), key=lambda n: (declared.get(n) or present[n][0], n)):
+            if name not in present:
+                click.echo(f"{declared[name]:<22} {name:<36} MISSING (run fix_db.py)")
+                continue
+            table, scans, size = present[name]
+            origin = 'declared' if name in declared else 'extra'
+            usage = 'usage not tracked' if scans is None else f"{scans} scans, {size // 1024} KiB"
+            if scans == 0:
+                usage += ' (unused)'
+            click.echo(f"{table:<22} {name:<36} {origin:<9} {usage}")
+
+    @app.cli.command('db-upgrade')
+    @click.option('--repair', is_flag=True, help='Accept edited migrations by recording their new checksums.')
+    def db_upgrade(repair):
+        """Apply the pending schema migrations."""
+        from migrations import migration_status, upgrade, repair_checksums
+
+        changed = [step for step, state in migration_status() if state == 'changed']
+        if changed and not repair:
+            names = ', '.join(f"{step.version} ({step.name})" for step in changed)
+            raise click.ClickException(f"Applied migrations were edited since: {names}. "
+                                       f"Review the change, then rerun with --repair.")
+        if changed:
+            repair_checksums()
+
+        done = upgrade()
+        for step in done:
+            click.echo(f"Applied {step.version}: {step.name}")
+        click.echo("Schema is up to date." if not done else f"{len(done)} migration(s) applied.")
+
+    @app.cli.command('db-status')
+    def db_status():
+        """List the schema migrations and whether each is applied."""
+        from migrations import migration_status
+
+        for step, state in migration_status():
+            click.echo(f"{step.version:>4}  {state:<8} {step.name}")
+
+    @app.cli.command('import-report')
+    @click.option('--module', default='wsgi', show_default=True, help='Module whose import is timed.')
+    @click.option('--limit', default=15, show_default=True, help='Number of packages listed.')
+    def import_report(module, limit):
+        """Time a cold import of the app (python -X importtime) and list the costliest packages."""
+        import subprocess
+        import sys
+
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                capture_output=True, text=True, cwd=app.root_path)
+        if result.returncode != 0:
+            raise click.ClickException(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+        # "import time: self [us] | cumulative | imported package"; self times summed per top-level package
+        packages = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            own, _, name = line[len('import time:'):].split('|')
+            package = name.strip().split('.')[0]
+            packages[package] = packages.get(package, 0) + int(own)
+
+        total = sum(packages.values())
+        click.echo(f"import {module}: {total / 1000:.0f} ms in {len(packages)} top-level packages")
+        for package, us in sorted(packages.items(), key=lambda item: -item[1])[:limit]:
+            click.echo(f"{package:<28} {us / 1000:>8.1f} ms  {100 * us / total:>5.1f}%")
+        for package in ('PIL', 'cloudinary'):
+            click.echo(f"{package:<28} {'loaded' if package in packages else 'not loaded'}")
+
+    @app.cli.command('precompile-templates')
+    def precompile_templates():
+        """Compile every template into the bytecode cache (run at build time)."""
+        import time
+        from prefork import compile_templates
+
+        directory = app.config.get('TEMPLATE_CACHE_DIR')
+        if not directory or app.jinja_env.bytecode_cache is None:
+            raise click.ClickException("TEMPLATE_CACHE_DIR is not set or not writable.")
+
+        app.jinja_env.bytecode_cache.clear()
+        started = time.perf_counter()
+        count = compile_templates(app)
+        click.echo(f"{count} templates compiled into {directory} in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,85 @@
+import time
+import hashlib
+from flask import request, session, g, make_response, current_app
+from cache_version import get_versions, changed_at, STAMPED_VERSIONS
+from page_shell import current_lang, is_shell_request
+
+# Catalog pages answered with ETag / Last-Modified validators
+CONDITIONAL_ENDPOINTS = {'main.index', 'main.shop', 'main.product_detail'}
+
+
+def page_etag():
+    """
+    Strong ETag for the current catalog page: catalog and settings versions,
+    language and full path. Outside shell mode the page also embeds the visitor's
+    cart, login state and a time-signed CSRF token, so those are part of it too.
+    """
+    catalog_version, settings_version = get_versions('catalog', 'settings')
+    parts = [str(catalog_version), str(settings_version), current_lang(), request.full_path]
+
+    if not is_shell_request():
+        cart = session.get('cart') or {}
+        parts.append(repr(sorted(cart.items())))
+        parts.append(str(session.get('_user_id', '')))
+        # A revalidated page must still carry a usable token: renew the tag every half time limit
+        time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+        if time_limit:
+            parts.append(str(int(time.time() // max(time_limit // 2, 1))))
+
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def page_last_modified():
+    """
+    Time of the last catalog or settings version bump: every write that changes a
+    catalog page moves it, including deletions and pricing-only edits.
+    """
+    return changed_at(*STAMPED_VERSIONS)
+
+
+def init_conditional_requests(app):
+    """
+    Answers conditional GETs for catalog pages with 304 before any rendering.
+    Only the throttled version check may touch the database.
+    """
+
+    @app.before_request
+    def check_not_modified():
+        if request.method != 'GET' or request.endpoint not in CONDITIONAL_ENDPOINTS:
+            return None
+        shell = is_shell_request()
+        # Pending messages are rendered into the page once; never answer 304 over them
+        if not shell and session.get('_flashes'):
+            return None
+
+        g.page_etag = page_etag()
+
+        not_modified = False
+        if request.if_none_match:
+            not_modified = g.page_etag in request.if_none_match
+        elif shell and request.if_modified_since:
+            # Last-Modified ignores per-visitor content, so it only validates shell pages
+            last_modified = page_last_modified()
+            not_modified = last_modified is not None and last_modified <= request.if_modified_since.replace(tzinfo=None)
+
+        if not_modified:
+            response = make_response('', 304)
+            response.set_etag(g.page_etag)
+            return response
+        return None
+
+    @app.after_request
+    def add_validators(response):
+        etag = g.pop('page_etag', None)
+        if etag is None or response.status_code != 200:
+            return response
+
+        response.set_etag(etag)
+        last_modified = page_last_modified()
+        if last_modified:
+            response.last_modified = last_modified
+        if not is_shell_request():
+            # The browser may keep the page but must revalidate it every time
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+        return response
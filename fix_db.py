@@ -12,7 +12,9 @@ MISSING_COLUMNS = {
     'product': [
         ('unit', "VARCHAR(50) DEFAULT 'pcs' NOT NULL"),
         ('is_hidden', "BOOLEAN DEFAULT FALSE NOT NULL"),
-        ('is_out_of_stock', "BOOLEAN DEFAULT FALSE NOT NULL")
+        ('is_out_of_stock', "BOOLEAN DEFAULT FALSE NOT NULL"),
+        ('search_text', "TEXT"),
+        ('created_at', "TIMESTAMP")
     ],
     'category': [
         ('image_url', "VARCHAR(500)")
@@ -37,9 +39,30 @@ MISSING_COLUMNS = {
     ],
     'user_log': [
         ('ip_address', "VARCHAR(50)")
+    ],
+    'order': [
+        ('customer_phone_normalized', "VARCHAR(50)")
     ]
 }
 
+# Indexes that were replaced by a differently shaped one in models.py
+OBSOLETE_INDEXES = ['ix_product_category_visible', 'ix_order_customer_phone']
+
+def declared_indexes(dialect_name):
+    """
+    Yields (table, index name, CREATE INDEX IF NOT EXISTS statement) for every
+    index declared in models.py, compiled for the target database so composite
+    and partial indexes come out exactly as db.create_all() would build them.
+    """
+    from sqlalchemy.dialects import postgresql, sqlite
+    from sqlalchemy.schema import CreateIndex
+    from models import db
+
+    dialect = postgresql.dialect() if dialect_name == 'postgresql' else sqlite.dialect()
+    for table in db.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            yield table.name, index.name, str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+
 # Placeholder for table schemas if full rebuild is needed (currently unused/incomplete)
 SCHEMAS = {}
 
@@ -81,6 +104,7 @@ def fix_sqlite(db_path):
     cursor = conn.cursor()
 
     check_and_add_columns_sqlite(conn, cursor)
+    check_and_add_indexes_sqlite(conn, cursor)
     migrate_permissions_sqlite(conn, cursor)
     ensure_foreign_keys_sqlite(conn, cursor)
 
@@ -103,7 +127,7 @@ def check_and_add_columns_sqlite(conn, cursor):
             if col_name not in existing_cols:
                 print(f"Column '{col_name}' missing in '{table}'. Adding it...")
                 try:
-                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_def}")
+                    cursor.execute(f"ALTER TABLE {safe_table} ADD COLUMN {col_name} {col_def}")
                     print(f"Column '{col_name}' added successfully.")
                 except Exception as e:
                     print(f"Error adding column {col_name}: {e}")
@@ -111,6 +135,23 @@ def check_and_add_columns_sqlite(conn, cursor):
                 print(f"Column '{col_name}' already exists in '{table}'.")
     conn.commit()
 
+def check_and_add_indexes_sqlite(conn, cursor):
+    print("Checking for missing indexes (SQLite)...")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {row[0] for row in cursor.fetchall()}
+
+    for table, index_name, create_sql in declared_indexes('sqlite'):
+        if table not in tables:
+            continue
+        try:
+            cursor.execute(create_sql)
+        except Exception as e:
+            print(f"Error creating index {index_name}: {e}")
+
+    for index_name in OBSOLETE_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+    conn.commit()
+
 def ensure_foreign_keys_sqlite(conn, cursor):
     print("\nChecking foreign keys (SQLite)...")
     tables_to_check = ['product', 'order', 'product_pricing', 'order_item']
@@ -216,6 +257,7 @@ def fix_postgres(db_url):
         cursor = conn.cursor()
 
         check_and_add_columns_postgres(conn, cursor)
+        check_and_add_indexes_postgres(conn, cursor)
         migrate_permissions_postgres(conn, cursor)
         ensure_foreign_keys_postgres(conn, cursor)
 
@@ -259,6 +301,22 @@ def check_and_add_columns_postgres(conn, cursor):
             else:
                  print(f"Column '{col_name}' already exists.")
 
+def check_and_add_indexes_postgres(conn, cursor):
+    print("Checking for missing indexes (PostgreSQL)...")
+    cursor.execute("SELECT tablename FROM pg_tables WHERE schemaname = current_schema()")
+    tables = {row[0] for row in cursor.fetchall()}
+
+    for table, index_name, create_sql in declared_indexes('postgresql'):
+        if table not in tables:
+            continue
+        try:
+            cursor.execute(create_sql)
+        except Exception as e:
+            print(f"Error creating index {index_name}: {e}")
+
+    for index_name in OBSOLETE_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+
 def ensure_foreign_keys_postgres(conn, cursor):
     print("\nChecking foreign keys (PostgreSQL)...")
 
@@ -0,0 +1,57 @@
+import gc
+import os
+import time
+
+# gunicorn settings, read by `gunicorn --config gunicorn.conf.py wsgi:app`.
+#
+# With GUNICORN_PRELOAD on (the default) the master imports and warms the app
+# once, freezes the objects it created so the workers' garbage collector never
+# writes to those pages, then forks. Each worker logs its boot time and memory
+# so the two modes can be compared by setting GUNICORN_PRELOAD=false.
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = max_requests // 10
+
+_started = time.monotonic()
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from prefork import warm_up, process_memory, format_memory
+
+    app = server.app.wsgi()
+    templates = warm_up(app)
+    gc.collect()
+    gc.freeze()
+    server.log.info(
+        f"App preloaded in {time.monotonic() - _started:.2f}s ({templates} templates compiled, "
+        f"{gc.get_freeze_count()} objects frozen), master {format_memory(process_memory())}"
+    )
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.monotonic()
+    if preload_app:
+        from prefork import reset_after_fork
+        reset_after_fork(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    from prefork import warm_up, process_memory, format_memory
+
+    if not preload_app:
+        warm_up(worker.wsgi)
+    worker.log.info(
+        f"Worker {worker.pid} ready in {time.monotonic() - worker.forked_at:.2f}s, "
+        f"{format_memory(process_memory())}"
+    )
+
+
+def worker_exit(server, worker):
+    # Queued audit log rows are written before the worker goes away
+    from audit_log import close_audit_log
+    close_audit_log(worker.wsgi)
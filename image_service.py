@@ -0,0 +1,77 @@
+import io
+import os
+import uuid
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+# Image uploads from the admin. Pillow and the Cloudinary SDK are imported on
+# the first upload rather than at startup: storefront requests, the CLI and the
+# test suite never touch them.
+
+MAX_WIDTH = 1024
+PLACEHOLDER_URL = "https://via.placeholder.com/300"
+
+_uploader = None
+
+
+def _cloudinary_uploader():
+    """Imports and configures the Cloudinary SDK once per process."""
+    global _uploader
+    if _uploader is None:
+        import cloudinary
+        import cloudinary.uploader
+
+        cloudinary.config(
+            cloud_name=os.environ.get('CLOUDINARY_CLOUD_NAME'),
+            api_key=os.environ.get('CLOUDINARY_API_KEY'),
+            api_secret=os.environ.get('CLOUDINARY_API_SECRET'),
+            secure=True
+        )
+        _uploader = cloudinary.uploader
+    return _uploader
+
+
+def _to_webp(file):
+    """The image scaled down to MAX_WIDTH and re-encoded as WebP, in a buffer."""
+    from PIL import Image
+
+    img = Image.open(file)
+    if img.width > MAX_WIDTH:
+        ratio = MAX_WIDTH / float(img.width)
+        new_height = int(float(img.height) * ratio)
+        img = img.resize((MAX_WIDTH, new_height), Image.Resampling.LANCZOS)
+
+    output_buffer = io.BytesIO()
+    img.save(output_buffer, format='WEBP', optimize=True, quality=80)
+    output_buffer.seek(0)
+    return output_buffer
+
+
+def optimize_and_save_image(file):
+    """Uploads an image to Cloudinary, optimized when possible, and returns its URL."""
+    filename = secure_filename(file.filename)
+    filename_base = filename.rsplit('.', 1)[0]
+
+    try:
+        upload_result = _cloudinary_uploader().upload(
+            _to_webp(file),
+            folder="luxfakya",
+            public_id=f"{filename_base}_{uuid.uuid4().hex[:8]}",
+            format="webp"
+        )
+        return upload_result['secure_url']
+
+    except Exception as e:
+        current_app.logger.error(f"Cloudinary upload error: {e}")
+        # Fallback to direct upload if optimization fails or Cloudinary fails
+        try:
+            file.seek(0)
+            upload_result = _cloudinary_uploader().upload(
+                file,
+                folder="luxfakya"
+            )
+            return upload_result['secure_url']
+        except Exception as e2:
+            current_app.logger.error(f"Cloudinary fallback upload error: {e2}")
+            # If everything fails, we'd need another fallback, but for now we expect Cloudinary to work
+            return PLACEHOLDER_URL
@@ -0,0 +1,50 @@
+from flask import g, request, before_render_template, template_rendered
+from werkzeug.local import LocalProxy
+from request_memo import memoized, memo_stats
+
+
+def lazy_value(name, compute):
+    """
+    Returns a proxy for a template context value. `compute` runs on first access
+    and its result is reused for the rest of the request; templates that never
+    touch the value never pay for it.
+    """
+    def resolve():
+        touched = g.get('template_context_touched')
+        if touched is not None:
+            touched.add(name)
+
+        return memoized(('template_context', name), compute)
+
+    return LocalProxy(resolve)
+
+
+def init_context_instrumentation(app):
+    """
+    Records which lazy context values each rendered template touched. The list is
+    logged at debug level and, with TEMPLATE_CONTEXT_DEBUG set, returned in the
+    X-Template-Context response header along with the request memo hit/miss
+    counters (X-Request-Memo).
+    """
+    def on_before_render(sender, template, context, **extra):
+        g.template_context_touched = set()
+
+    def on_rendered(sender, template, context, **extra):
+        touched = sorted(g.pop('template_context_touched', None) or ())
+        g.setdefault('template_context_log', []).append((template.name, touched))
+        sender.logger.debug(f"Template {template.name} used context values: {', '.join(touched) or 'none'}")
+
+    before_render_template.connect(on_before_render, app, weak=False)
+    template_rendered.connect(on_rendered, app, weak=False)
+
+    @app.after_request
+    def add_template_context_header(response):
+        stats = memo_stats()
+        app.logger.debug(f"Request memo for {request.path}: {stats['hits']} hits, {stats['misses']} misses")
+        if app.config.get('TEMPLATE_CONTEXT_DEBUG'):
+            if g.get('template_context_log'):
+                response.headers['X-Template-Context'] = '; '.join(
+                    f"{name}={','.join(touched) or '-'}" for name, touched in g.template_context_log
+                )
+            response.headers['X-Request-Memo'] = f"hits={stats['hits']}, misses={stats['misses']}"
+        return response
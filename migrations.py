@@ -0,0 +1,195 @@
+import hashlib
+import importlib
+import inspect
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from models import db, SchemaMigration
+
+# Versioned schema and data migrations. Each step runs once per database and is
+# recorded in the schema_migration ledger with a checksum of its source, so an
+# edit to an already applied step is reported instead of silently diverging.
+#
+# Boot only compares the highest applied version with the latest step below
+# (one primary-key lookup). Pending steps are applied by `flask db-upgrade`,
+# which the Procfile runs once per deploy; SQLite databases (development and
+# tests) are upgraded at boot unless AUTO_MIGRATE is turned off.
+#
+# Add new steps at the end with the next version number. A step for a new model
+# creates its table with Model.__table__.create(db.engine, checkfirst=True);
+# never edit a step that has shipped. A step that delegates to another module
+# names it in depends_on, so the checksum covers that module too: the baseline
+# covers fix_db.py, and new columns therefore go in a new step, not in fix_db.
+
+MIGRATIONS = []
+
+
+class Migration:
+    def __init__(self, version, name, apply, depends_on=()):
+        self.version = version
+        self.name = name
+        self.apply = apply
+        self.depends_on = depends_on
+
+    @property
+    def checksum(self):
+        sources = [inspect.getsource(self.apply)]
+        sources.extend(inspect.getsource(importlib.import_module(module)) for module in self.depends_on)
+        return hashlib.sha256('\n'.join(sources).encode('utf-8')).hexdigest()
+
+
+def migration(version, name, depends_on=()):
+    def register(apply):
+        MIGRATIONS.append(Migration(version, name, apply, depends_on))
+        return apply
+    return register
+
+
+@migration(1, 'baseline schema', depends_on=('fix_db',))
+def _baseline():
+    # Tables of a new database, then the columns, indexes, permission flags and
+    # foreign keys that databases created by older releases lack
+    from fix_db import run_db_fix
+    db.create_all()
+    run_db_fix(current_app.config['SQLALCHEMY_DATABASE_URI'])
+
+
+@migration(2, 'search indexes')
+def _search_indexes():
+    from search import ensure_search_index, ensure_substring_indexes
+    ensure_search_index()
+    ensure_substring_indexes()
+
+
+@migration(3, 'co-purchase matrix backfill')
+def _cooccurrence():
+    from recommendations import ensure_cooccurrence
+    ensure_cooccurrence()
+
+
+@migration(4, 'sales rollups backfill')
+def _sales_rollups():
+    from sales import ensure_sales_rollups
+    ensure_sales_rollups()
+
+
+@migration(5, 'meta pixel id')
+def _meta_pixel_id():
+    from settings import set_setting
+    set_setting('meta_pixel_id', '1626031432043896')
+    db.session.commit()
+
+
+@migration(6, 'co-purchase change log')
+def _cooccurrence_change_log():
+    from models import CooccurrenceChange
+    CooccurrenceChange.__table__.create(db.engine, checkfirst=True)
+
+
+@migration(7, 'normalized customer phone')
+def _normalized_customer_phone():
+    # Column, backfill in one UPDATE (same separators as models.normalize_phone),
+    # then the search index that replaces the one on the raw phone
+    from sqlalchemy import inspect, text, update
+    from sqlalchemy.schema import CreateIndex
+    from models import Order, PHONE_SEPARATORS
+
+    columns = {column['name'] for column in inspect(db.engine).get_columns('order')}
+    if 'customer_phone_normalized' not in columns:
+        db.session.execute(text('ALTER TABLE "order" ADD COLUMN customer_phone_normalized VARCHAR(50)'))
+
+    phone = Order.customer_phone
+    for separator in PHONE_SEPARATORS:
+        phone = func.replace(phone, separator, '')
+    db.session.execute(update(Order).where(Order.customer_phone.isnot(None)).values(customer_phone_normalized=phone))
+
+    index = next(i for i in Order.__table__.indexes if i.name == 'ix_order_customer_phone_normalized')
+    db.session.execute(CreateIndex(index, if_not_exists=True))
+    db.session.execute(text('DROP INDEX IF EXISTS ix_order_customer_phone'))
+    db.session.commit()
+
+
+@migration(8, 'drop unused updated_at columns')
+def _drop_updated_at():
+    # Last-Modified comes from the catalog and settings bump times (cache_version.py)
+    from sqlalchemy import inspect, text
+    inspector = inspect(db.engine)
+    for table in ('product', 'category', 'home_section'):
+        if 'updated_at' in {column['name'] for column in inspector.get_columns(table)}:
+            db.session.execute(text(f'ALTER TABLE {table} DROP COLUMN updated_at'))
+    db.session.commit()
+
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version():
+    """Highest applied migration, 0 for a database without a ledger."""
+    try:
+        return db.session.query(func.max(SchemaMigration.version)).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        return 0
+
+
+def migration_status():
+    """[(migration, state)] with state 'applied', 'pending' or 'changed' (checksum mismatch)."""
+    try:
+        applied = {row.version: row.checksum for row in SchemaMigration.query.all()}
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        applied = {}
+
+    status = []
+    for step in MIGRATIONS:
+        if step.version not in applied:
+            state = 'pending'
+        elif applied[step.version] != step.checksum:
+            state = 'changed'
+        else:
+            state = 'applied'
+        status.append((step, state))
+    return status
+
+
+def upgrade():
+    """Applies the pending migrations in order and returns them. Each is committed with its ledger row."""
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+
+    done = []
+    for step, state in migration_status():
+        if state != 'pending':
+            continue
+        current_app.logger.info(f"Applying migration {step.version}: {step.name}")
+        step.apply()
+        db.session.add(SchemaMigration(version=step.version, name=step.name,
+                                       checksum=step.checksum, applied_at=datetime.utcnow()))
+        db.session.commit()
+        done.append(step)
+    return done
+
+
+def repair_checksums():
+    """Records the current checksum of every applied migration, after a reviewed edit."""
+    for step, state in migration_status():
+        if state == 'changed':
+            SchemaMigration.query.filter_by(version=step.version).update({'checksum': step.checksum})
+    db.session.commit()
+
+
+def check_schema(auto_migrate=False):
+    """
+    Boot-time check. Returns immediately when the schema is current; otherwise
+    upgrades (auto_migrate) or logs that `flask db-upgrade` is due.
+    """
+    version = schema_version()
+    if version >= LATEST_VERSION:
+        return
+    if auto_migrate:
+        upgrade()
+    else:
+        current_app.logger.warning(
+            f"Database schema is at version {version}, this release expects {LATEST_VERSION}. "
+            f"Run `flask --app wsgi db-upgrade`."
+        )
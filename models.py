@@ -4,6 +4,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
+from sqlalchemy.orm import validates
 import sqlite3
 
 db = SQLAlchemy()
@@ -74,6 +75,12 @@ class User(UserMixin, db.Model):
         return check_password_hash(self.password_hash, password)
 
 class UserLog(db.Model):
+    __table_args__ = (
+        # Activity log, newest first
+        db.Index('ix_user_log_timestamp', 'timestamp'),
+        db.Index('ix_user_log_user', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     action = db.Column(db.String(100), nullable=False)
@@ -96,7 +103,36 @@ class Category(db.Model):
             'image_url': self.image_url
         }
 
+def resolve_display_image_url(image_url, category_name):
+    """Pick the image shown for a product, falling back to its category artwork."""
+    url = image_url
+    if not url and category_name:
+        if 'Dattes' in category_name:
+            url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132198/luxfakya/static/dates.png'
+        elif 'Fruits secs' in category_name:
+            url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132199/luxfakya/static/nuts.png'
+        elif 'Fruits confits' in category_name or 'Fruits lyophilisés' in category_name:
+            url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132200/luxfakya/static/driedfood.png'
+        elif 'Offres' in category_name:
+            url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132201/luxfakya/static/gift.png'
+        else:
+            url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132183/luxfakya/static/logo.png'
+
+    if not url:
+        url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132183/luxfakya/static/logo.png'
+
+    # Inject optimization parameters if it's a Cloudinary URL
+    if 'cloudinary.com' in url and '/upload/' in url and '/f_auto,q_auto/' not in url:
+        url = url.replace('/upload/', '/upload/f_auto,q_auto/')
+
+    return url
+
 class ProductPricing(db.Model):
+    __table_args__ = (
+        # Tier prices of a product, loaded in quantity order
+        db.Index('ix_product_pricing_product', 'product_id', 'quantity'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     quantity = db.Column(db.Float, nullable=False)
@@ -111,6 +147,17 @@ class ProductPricing(db.Model):
         }
 
 class Product(db.Model):
+    __table_args__ = (
+        # Shop listing: visible products sorted by price or name, id as the keyset tiebreaker
+        db.Index('ix_product_visible_price', 'is_hidden', 'price', 'id'),
+        db.Index('ix_product_visible_name', 'is_hidden', 'name', 'id'),
+        # Category pages: visible products only, so hidden ones cost nothing to skip
+        db.Index('ix_product_visible_category', 'category_id', 'price', 'id',
+                 sqlite_where=db.text('is_hidden = 0'), postgresql_where=db.text('is_hidden = false')),
+        # Admin category filter and the category foreign key
+        db.Index('ix_product_category', 'category_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=True)
@@ -123,31 +170,14 @@ class Product(db.Model):
     image_url = db.Column(db.String(500), nullable=True)
     is_hidden = db.Column(db.Boolean, default=False)
     is_out_of_stock = db.Column(db.Boolean, default=False)
+    # Name and description folded for accent/diacritic-insensitive search (see search.py)
+    search_text = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     pricings = db.relationship('ProductPricing', backref='product', cascade="all, delete-orphan", lazy=True, order_by='ProductPricing.quantity')
 
     @property
     def display_image_url(self):
-        url = self.image_url
-        if not url and self.category:
-            if 'Dattes' in self.category.name:
-                url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132198/luxfakya/static/dates.png'
-            elif 'Fruits secs' in self.category.name:
-                url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132199/luxfakya/static/nuts.png'
-            elif 'Fruits confits' in self.category.name or 'Fruits lyophilisés' in self.category.name:
-                url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132200/luxfakya/static/driedfood.png'
-            elif 'Offres' in self.category.name:
-                url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132201/luxfakya/static/gift.png'
-            else:
-                url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132183/luxfakya/static/logo.png'
-        
-        if not url:
-            url = 'https://res.cloudinary.com/dkj3xajcy/image/upload/v1777132183/luxfakya/static/logo.png'
-             
-        # Inject optimization parameters if it's a Cloudinary URL
-        if 'cloudinary.com' in url and '/upload/' in url and '/f_auto,q_auto/' not in url:
-            url = url.replace('/upload/', '/upload/f_auto,q_auto/')
-            
-        return url
+        return resolve_display_image_url(self.image_url, self.category.name if self.category else None)
 
     def to_dict(self):
         return {
@@ -163,13 +193,33 @@ class Product(db.Model):
             'pricings': [p.to_dict() for p in self.pricings]
         }
 
+# Characters dropped from phone numbers before they are stored for search or searched for
+PHONE_SEPARATORS = ' -.()'
+
+def normalize_phone(phone):
+    """'06 61-23.45 67' and '0661234567' are the same number to the order search."""
+    if phone is None:
+        return None
+    for separator in PHONE_SEPARATORS:
+        phone = phone.replace(separator, '')
+    return phone
+
 class Order(db.Model):
+    __table_args__ = (
+        # Admin order list: newest first, optionally by status, paged on (created_at, id)
+        db.Index('ix_order_status_created', 'status', 'created_at', 'id'),
+        db.Index('ix_order_created', 'created_at', 'id'),
+        # Order search by customer phone, as typed with or without separators
+        db.Index('ix_order_customer_phone_normalized', 'customer_phone_normalized'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
 
     customer_name = db.Column(db.String(150), nullable=False)
     customer_email = db.Column(db.String(150), nullable=True)
     customer_phone = db.Column(db.String(50), nullable=True)
+    customer_phone_normalized = db.Column(db.String(50), nullable=True)
     customer_address = db.Column(db.String(255), nullable=True)
     customer_city = db.Column(db.String(100), nullable=True)
 
@@ -178,7 +228,19 @@ class Order(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade="all, delete-orphan")
 
+    @validates('customer_phone')
+    def _store_normalized_phone(self, key, phone):
+        self.customer_phone_normalized = normalize_phone(phone)
+        return phone
+
 class OrderItem(db.Model):
+    __table_args__ = (
+        # Order lines, and the order_id self-join that counts co-purchases
+        db.Index('ix_order_item_order_product', 'order_id', 'product_id'),
+        # ON DELETE SET NULL when a product is deleted
+        db.Index('ix_order_item_product', 'product_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
 
@@ -189,6 +251,57 @@ class OrderItem(db.Model):
     unit = db.Column(db.String(50), nullable=False)
     price_at_purchase = db.Column(db.Float, nullable=False)
 
+class ProductCooccurrence(db.Model):
+    """
+    Sparse product x product matrix: how many completed orders contained both
+    products. Both directions are stored so a product's row is one range scan.
+    Maintained by recommendations.py.
+    """
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    other_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+class CooccurrenceChange(db.Model):
+    """
+    Products whose bought-together lists changed at a recommendations version,
+    so workers refresh only those lists. Only the latest entries are kept.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, index=True)
+    product_ids = db.Column(db.Text, nullable=False)  # comma-separated
+
+class ProductSalesDaily(db.Model):
+    """
+    Completed sales per product and day (the order's creation date). Maintained
+    incrementally on order status changes by sales.py.
+    """
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+class DailySales(db.Model):
+    """Orders and their total per creation day and current status (see sales.py)."""
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class DailyCitySales(db.Model):
+    """Completed orders and their total per day and delivery city (see sales.py)."""
+    day = db.Column(db.Date, primary_key=True)
+    city = db.Column(db.String(100), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class SchemaMigration(db.Model):
+    """Ledger of the migrations applied to this database (see migrations.py)."""
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    checksum = db.Column(db.String(64), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class HomeSection(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     section_name = db.Column(db.String(50), unique=True, nullable=False) # e.g., 'limited_offer'
@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+from flask import request, session, g, make_response, current_app
+from flask_wtf.csrf import generate_csrf
+from cache_version import get_versions
+from page_shell import current_lang, is_shell_request
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Storefront pages that render the same HTML for every anonymous visitor of a language
+CACHED_ENDPOINTS = {'main.index', 'main.shop', 'main.about', 'main.product_detail'}
+
+# Query parameters that change what those pages render. Anything else (tracking
+# tags, cache busters) is left out of the key so it cannot mint new entries.
+KEY_PARAMS = ('category', 'q', 'sort', 'per_page', 'after', 'lang')
+
+# The per-session CSRF token is swapped for this marker before a page is stored,
+# and the visitor's own token is put back when it is served.
+CSRF_PLACEHOLDER = b'__PAGE_CACHE_CSRF_TOKEN__'
+
+
+def _dump_entry(entry, expires):
+    meta = json.dumps({'content_type': entry['content_type'], 'expires': expires}).encode('utf-8')
+    return meta + b'\n' + entry['body']
+
+
+def _load_entry(raw):
+    meta, _, body = raw.partition(b'\n')
+    meta = json.loads(meta)
+    if meta['expires'] and meta['expires'] < time.time():
+        return None
+    return {'content_type': meta['content_type'], 'body': body}
+
+
+class MemoryBackend:
+    """In-process LRU, one per worker."""
+
+    def __init__(self, max_entries=512, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, entry = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class FileSystemBackend:
+    """
+    Shared by every worker on the host; entries are written atomically. Every
+    max_entries // 4 writes, a worker removes the expired files, then the oldest
+    ones beyond max_entries.
+    """
+
+    def __init__(self, directory, timeout=300, max_entries=2048):
+        self.directory = directory
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._prune_every = max(max_entries // 4, 1)
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = _load_entry(f.read())
+        except (OSError, ValueError):
+            return None
+        if entry is None:
+            self._remove(path)
+        return entry
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def prune(self):
+        """Removes expired entries, then the least recently written beyond max_entries."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                # Entries are named by their 64-character hash; skip temp files being written
+                if len(item.name) != 64:
+                    continue
+                try:
+                    entries.append((item.stat().st_mtime, item.path))
+                except OSError:
+                    pass
+
+        cutoff = time.time() - self.timeout
+        live = []
+        for written, path in entries:
+            if written < cutoff:
+                self._remove(path)
+            else:
+                live.append((written, path))
+        live.sort()
+        for _, path in live[:max(len(live) - self.max_entries, 0)]:
+            self._remove(path)
+
+    def set(self, key, entry):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_dump_entry(entry, time.time() + self.timeout))
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self._prune_every == 0
+        if due:
+            self.prune()
+
+
+class RedisBackend:
+    """Any Redis-compatible server; needs the optional `redis` package."""
+
+    def __init__(self, url, timeout=300):
+        if redis is None:
+            raise RuntimeError("PAGE_CACHE_BACKEND='redis' requires the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.timeout = timeout
+
+    def get(self, key):
+        try:
+            raw = self.client.get(f'page:{key}')
+        except redis.RedisError:
+            return None
+        return _load_entry(raw) if raw else None
+
+    def set(self, key, entry):
+        try:
+            self.client.set(f'page:{key}', _dump_entry(entry, 0), ex=self.timeout)
+        except redis.RedisError:
+            pass
+
+
+def create_backend(config):
+    name = config.get('PAGE_CACHE_BACKEND')
+    timeout = config.get('PAGE_CACHE_TIMEOUT', 300)
+    if name == 'memory':
+        return MemoryBackend(config.get('PAGE_CACHE_MAX_ENTRIES', 512), timeout)
+    if name == 'filesystem':
+        return FileSystemBackend(config.get('PAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'luxfakia-pages')),
+                                 timeout, config.get('PAGE_CACHE_MAX_ENTRIES', 2048))
+    if name == 'redis':
+        return RedisBackend(config.get('PAGE_CACHE_REDIS_URL', 'redis://localhost:6379/0'), timeout)
+    raise ValueError(f"Unknown PAGE_CACHE_BACKEND: {name}")
+
+
+def is_anonymous_visit():
+    """True when the page cannot differ from what any other visitor of the language sees."""
+    if is_shell_request():
+        return True
+    return ('_user_id' not in session
+            and not session.get('cart')
+            and not session.get('_flashes'))
+
+
+def page_cache_key():
+    lang = current_lang()
+    query = urlencode([(name, request.args[name]) for name in KEY_PARAMS if name in request.args])
+    catalog_version, settings_version = get_versions('catalog', 'settings')
+    return f"{request.path}?{query}|{lang}|c{catalog_version}|s{settings_version}"
+
+
+def init_page_cache(app):
+    """
+    Opt-in full-page cache for anonymous storefront visits, enabled by setting
+    PAGE_CACHE_BACKEND to 'memory', 'filesystem' or 'redis'. Keys include the
+    catalog and settings versions, so admin edits invalidate every page at once.
+    """
+    if not app.config.get('PAGE_CACHE_BACKEND'):
+        return
+
+    backend = create_backend(app.config)
+    app.extensions['page_cache'] = backend
+
+    @app.before_request
+    def serve_cached_page():
+        if request.method != 'GET' or request.endpoint not in CACHED_ENDPOINTS or not is_anonymous_visit():
+            return None
+
+        key = page_cache_key()
+        entry = backend.get(key)
+        if entry is None:
+            g.page_cache_key = key
+            return None
+
+        body = entry['body']
+        if CSRF_PLACEHOLDER in body:
+            body = body.replace(CSRF_PLACEHOLDER, generate_csrf().encode('utf-8'))
+        response = make_response(body)
+        response.content_type = entry['content_type']
+        response.headers['X-Page-Cache'] = 'HIT'
+        return response
+
+    @app.after_request
+    def store_page(response):
+        key = g.pop('page_cache_key', None)
+        if key is None or response.status_code != 200 or response.direct_passthrough:
+            return response
+        # Rendering may have flashed a message or filled the cart
+        if not is_anonymous_visit():
+            return response
+
+        body = response.get_data()
+        token = g.get(current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token'))
+        if token:
+            body = body.replace(token.encode('utf-8'), CSRF_PLACEHOLDER)
+        backend.set(key, {'content_type': response.content_type, 'body': body})
+        response.headers['X-Page-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,74 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from flask import current_app, request, session, has_request_context
+from flask.sessions import SecureCookieSessionInterface
+
+# Storefront pages that can be rendered as a shared shell: catalog data only,
+# with the cart, user menu, flashes and CSRF token filled in from /api/session-summary.
+SHELL_ENDPOINTS = {'main.index', 'main.shop', 'main.shop_items', 'main.about', 'main.product_detail'}
+
+LANGUAGES = ('fr', 'ar')
+
+
+def is_shell_request():
+    return (has_request_context()
+            and current_app.config.get('SHELL_MODE')
+            and request.endpoint in SHELL_ENDPOINTS)
+
+
+def current_lang():
+    """
+    Language of the current request. Shell pages read it from the URL so the
+    response never depends on the session cookie; other pages use the session.
+    """
+    if is_shell_request():
+        lang = request.args.get('lang', 'fr')
+    else:
+        lang = session.get('lang', 'fr')
+    return lang if lang in LANGUAGES else 'fr'
+
+
+def with_lang(url, lang):
+    """Returns `url` with its ?lang= parameter set for `lang` (dropped for the default)."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'lang']
+    if lang != 'fr':
+        query.append(('lang', lang))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class ShellSessionInterface(SecureCookieSessionInterface):
+    """
+    Shell pages never write the session, so their responses carry no Set-Cookie or
+    Vary: Cookie and stay shareable. Incidental writes (Flask-Login's session
+    protection marks every loaded session) are left for the next non-shell request.
+    """
+
+    def save_session(self, app, session, response):
+        if is_shell_request():
+            return
+        super().save_session(app, session, response)
+
+
+def init_page_shell(app):
+    """
+    Shell mode (SHELL_MODE config) makes storefront pages identical for every
+    visitor of a language, so browsers and shared proxies may cache them.
+    """
+    if not app.config.get('SHELL_MODE'):
+        return
+
+    app.session_interface = ShellSessionInterface()
+
+    @app.url_defaults
+    def add_lang_to_shell_urls(endpoint, values):
+        if endpoint in SHELL_ENDPOINTS and 'lang' not in values and has_request_context():
+            lang = current_lang()
+            if lang != 'fr':
+                values['lang'] = lang
+
+    @app.after_request
+    def mark_shell_cacheable(response):
+        if is_shell_request() and request.method == 'GET' and response.status_code == 200:
+            response.cache_control.public = True
+            response.cache_control.max_age = app.config.get('SHELL_MAX_AGE', 60)
+        return response
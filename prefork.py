@@ -0,0 +1,81 @@
+import os
+from jinja2 import FileSystemBytecodeCache
+from models import db
+
+# Start-up work done once instead of in every worker. Templates are compiled at
+# build time into a bytecode cache on disk, and the gunicorn master (see
+# gunicorn.conf.py) loads them and the catalog snapshot before it forks, so the
+# workers share them copy-on-write instead of rebuilding them.
+
+
+def init_template_cache(app):
+    """Stores compiled templates under TEMPLATE_CACHE_DIR, if set and writable."""
+    directory = app.config.get('TEMPLATE_CACHE_DIR')
+    if not directory:
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        app.logger.warning(f"Template bytecode cache disabled: {e}")
+        return
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def compile_templates(app):
+    """Compiles every page template (into the bytecode cache when enabled). Returns their number."""
+    templates = app.jinja_env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in templates:
+        app.jinja_env.get_template(name)
+    return len(templates)
+
+
+def warm_up(app):
+    """Compiles every template and loads the catalog snapshot. Returns the number of templates."""
+    from catalog import get_catalog
+
+    templates = compile_templates(app)
+
+    with app.app_context():
+        try:
+            get_catalog()
+        except Exception as e:
+            app.logger.error(f"Catalog warm-up failed: {e}")
+        finally:
+            db.session.remove()
+            # Connections must not be inherited by the workers
+            db.engine.dispose()
+
+    return templates
+
+
+def reset_after_fork(app):
+    """Drops the pool inherited from the master without closing its sockets, which the master still owns."""
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def process_memory(pid='self'):
+    """
+    {'rss': KiB, 'pss': KiB, 'private': KiB} of a process, from /proc. Pages
+    shared with the master count fully in rss but only in part in pss and not
+    at all in private, so private is what each extra worker really costs.
+    Empty where /proc is unavailable.
+    """
+    fields = {'Rss': 'rss', 'Pss': 'pss', 'Private_Clean': 'private', 'Private_Dirty': 'private'}
+    memory = {}
+    try:
+        with open(os.path.join('/proc', str(pid), 'smaps_rollup')) as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    name = fields[key]
+                    memory[name] = memory.get(name, 0) + int(value.split()[0])
+    except (OSError, ValueError):
+        return {}
+    return memory
+
+
+def format_memory(memory):
+    if not memory:
+        return 'memory n/a'
+    return ', '.join(f"{name} {kib / 1024:.1f} MiB" for name, kib in memory.items())
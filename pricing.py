@@ -0,0 +1,106 @@
+from flask import session
+from models import Product
+from settings import get_settings
+from queries import products_with_pricings
+from request_memo import memoized
+
+def quantity_key(quantity):
+    """Cart quantities are kilograms (or pieces) as floats; tiers are matched on whole grams."""
+    return int(round(float(quantity) * 1000))
+
+
+def build_tier_index(pricings):
+    """Maps quantized tier quantity -> tier price, so a lookup is a dict hit instead of a scan."""
+    return {quantity_key(p.quantity): p.price for p in pricings}
+
+
+class CartLine:
+    __slots__ = ('product', 'quantity', 'total')
+
+    def __init__(self, product, quantity, total):
+        self.product = product
+        self.quantity = quantity
+        self.total = total
+
+    @property
+    def unit_price(self):
+        return self.total / self.quantity if self.quantity > 0 else 0
+
+
+class CartQuote:
+    """Priced cart: lines, subtotal and shipping, shared by every consumer in a request."""
+
+    def __init__(self, lines, free_shipping_threshold, shipping_cost):
+        self.lines = lines
+        self.subtotal = round(sum(line.total for line in lines), 2)
+        self.free_shipping_threshold = free_shipping_threshold
+        self.shipping_cost = shipping_cost
+        self.shipping_fee = 0 if self.subtotal >= free_shipping_threshold else shipping_cost
+        self.grand_total = round(self.subtotal + self.shipping_fee, 2)
+        self.remaining_amount = max(0, free_shipping_threshold - self.subtotal)
+
+
+class PricingEngine:
+    """
+    Prices carts against the catalog snapshot. Products missing from the snapshot
+    (e.g. created by another worker a moment ago) are fetched in one batched query.
+    """
+
+    def __init__(self, catalog=None):
+        self.catalog = catalog
+
+    def load_products(self, product_ids):
+        products = {}
+        missing = []
+        for product_id in product_ids:
+            product = self.catalog.get_product(product_id) if self.catalog else None
+            if product is not None:
+                products[product_id] = product
+            else:
+                missing.append(product_id)
+
+        if missing:
+            rows = products_with_pricings().filter(Product.id.in_(missing)).all()
+            for product in rows:
+                products[product.id] = product
+        return products
+
+    def line_total(self, product, quantity):
+        tiers = getattr(product, 'tier_prices', None)
+        if tiers is None:
+            tiers = build_tier_index(product.pricings)
+
+        # A matching tier overrides the base per-unit price
+        tier_price = tiers.get(quantity_key(quantity))
+        if tier_price is not None:
+            return round(tier_price, 2)
+        return round(product.price * quantity, 2)
+
+    def quote(self, cart, free_shipping_threshold, shipping_cost):
+        items = [(int(pid), quantity) for pid, quantity in cart.items()]
+        products = self.load_products([pid for pid, _ in items])
+
+        lines = []
+        for pid, quantity in items:
+            product = products.get(pid)
+            if product:
+                lines.append(CartLine(product, quantity, self.line_total(product, quantity)))
+
+        return CartQuote(lines, free_shipping_threshold, shipping_cost)
+
+
+def get_cart_quote():
+    """
+    Returns the quote for the session cart, computed at most once per request
+    for a given cart content.
+    """
+    from catalog import get_catalog
+
+    cart = session.get('cart') or {}
+
+    def compute():
+        settings = get_settings()
+        return PricingEngine(get_catalog() if cart else None).quote(
+            cart, settings['free_shipping_threshold'], settings['shipping_cost'])
+
+    return memoized(('cart_quote', tuple(sorted(cart.items()))), compute)
@@ -0,0 +1,28 @@
+from sqlalchemy.orm import joinedload, selectinload
+from models import Product, Order, UserLog
+
+# Query builders for each view's access pattern. Relationships on the models are
+# lazy, so anything a template walks per row is loaded up front here: many-to-one
+# with a JOIN, one-to-many with a single extra SELECT ... IN.
+
+
+def products_with_pricings():
+    """Products with their tier prices (catalog snapshot, pricing fallback)."""
+    return Product.query.options(selectinload(Product.pricings))
+
+
+def products_for_admin():
+    """Admin product table: category name, display image and tier prices."""
+    return Product.query.options(joinedload(Product.category), selectinload(Product.pricings))
+
+
+def product_for_edit(product_id):
+    return Product.query.options(selectinload(Product.pricings)).filter(Product.id == product_id).first_or_404()
+
+
+def order_with_items(order_id):
+    return Order.query.options(selectinload(Order.items)).filter(Order.id == order_id).first_or_404()
+
+
+def logs_with_users():
+    return UserLog.query.options(joinedload(UserLog.user))
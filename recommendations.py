@@ -0,0 +1,175 @@
+from flask import current_app
+from sqlalchemy import func, insert, delete
+from sqlalchemy.orm import aliased
+from models import db, Order, OrderItem, ProductCooccurrence, CooccurrenceChange
+from cache_version import bump_version
+from sales import upsert_counters
+
+# "Frequently bought together": ProductCooccurrence holds, for every pair of
+# products, the number of completed orders containing both. It is updated one
+# order at a time when an order is confirmed or a completed order is cancelled,
+# and can be rebuilt from the whole order history with a single INSERT ... SELECT.
+# The catalog snapshot loads it with the catalog and keeps the top-k lists in memory.
+#
+# An order only changes the lists of its own products, so it bumps a separate
+# 'recommendations' version and records those product ids in CooccurrenceChange;
+# workers then recompute just those lists instead of reloading the catalog.
+
+RELATED_LIMIT = 3
+TOP_K = 10
+CHANGE_LOG_SIZE = 1000
+
+
+def _order_product_ids(order):
+    return sorted({item.product_id for item in order.items if item.product_id is not None})
+
+
+def record_order(order, delta):
+    """
+    Adds (delta=1) or removes (delta=-1) one order's pairs from the matrix in the
+    current session, with one atomic upsert so concurrent confirmations never lose
+    a count, and publishes the change to the workers. Call when an order enters or
+    leaves the Completed status; the caller commits.
+    """
+    product_ids = _order_product_ids(order)
+    if len(product_ids) < 2:
+        return
+
+    upsert_counters(ProductCooccurrence, ('product_id', 'other_id'), [
+        {'product_id': product_id, 'other_id': other_id, 'orders': delta}
+        for product_id in product_ids for other_id in product_ids if product_id != other_id
+    ])
+    if delta < 0:
+        db.session.execute(delete(ProductCooccurrence).where(
+            ProductCooccurrence.product_id.in_(product_ids),
+            ProductCooccurrence.other_id.in_(product_ids),
+            ProductCooccurrence.orders <= 0
+        ))
+    publish_changes(product_ids)
+
+
+def publish_changes(product_ids):
+    """
+    Bumps the recommendations version and logs the products whose lists it
+    changed, keeping the last CHANGE_LOG_SIZE entries. The bump is atomic, so
+    concurrent orders never share a version and changed_since sees each of them.
+    The caller commits.
+    """
+    version = bump_version('recommendations')
+    db.session.add(CooccurrenceChange(version=version, product_ids=','.join(str(pid) for pid in product_ids)))
+    db.session.execute(delete(CooccurrenceChange).where(CooccurrenceChange.version <= version - CHANGE_LOG_SIZE))
+
+
+def changed_since(version):
+    """
+    Ids of the products whose lists changed after recommendations `version`, or
+    None when the log no longer covers that version and everything must be reloaded.
+    """
+    rows = db.session.execute(
+        db.select(CooccurrenceChange.version, CooccurrenceChange.product_ids)
+        .where(CooccurrenceChange.version > version)
+        .order_by(CooccurrenceChange.version)
+    ).all()
+    if not rows or rows[0].version != version + 1:
+        return None
+    return {int(pid) for row in rows for pid in row.product_ids.split(',') if pid}
+
+
+def _pair_counts():
+    """Completed orders per ordered pair of products, counted by the database."""
+    other = aliased(OrderItem)
+    return (db.select(OrderItem.product_id, other.product_id, func.count(func.distinct(OrderItem.order_id)))
+            .join(other, (other.order_id == OrderItem.order_id) & (other.product_id != OrderItem.product_id))
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(Order.status == 'Completed')
+            .group_by(OrderItem.product_id, other.product_id))
+
+
+def rebuild_cooccurrence():
+    """Recomputes the whole matrix from the order history. The caller commits."""
+    db.session.execute(delete(ProductCooccurrence))
+    db.session.execute(insert(ProductCooccurrence).from_select(
+        ['product_id', 'other_id', 'orders'], _pair_counts()
+    ))
+    return db.session.query(func.count()).select_from(ProductCooccurrence).scalar()
+
+
+def ensure_cooccurrence():
+    """Backfills the matrix on first start after it was introduced."""
+    if db.session.query(ProductCooccurrence.product_id).first() is not None:
+        return
+    if Order.query.filter(Order.status == 'Completed').first() is None:
+        return
+    pairs = rebuild_cooccurrence()
+    db.session.commit()
+    current_app.logger.info(f"Co-purchase matrix built with {pairs} pairs")
+
+
+def copurchase_counts(product_ids=None):
+    """{product_id: {other_id: orders}} read from the matrix in one query, optionally for some products only."""
+    counts = {}
+    query = db.select(ProductCooccurrence.product_id, ProductCooccurrence.other_id, ProductCooccurrence.orders)
+    if product_ids is not None:
+        query = query.where(ProductCooccurrence.product_id.in_(product_ids))
+    rows = db.session.execute(query)
+    for product_id, other_id, orders in rows:
+        counts.setdefault(product_id, {})[other_id] = orders
+    return counts
+
+
+def build_bought_together(counts, available, k=TOP_K):
+    """
+    {product_id: [(other_id, orders), ...]}: the k products most often bought
+    with each product, restricted to the `available` ids.
+    """
+    top = {}
+    for product_id, others in counts.items():
+        ranked = sorted(((pid, n) for pid, n in others.items() if pid in available), key=lambda pair: (-pair[1], pair[0]))
+        if ranked:
+            top[product_id] = ranked[:k]
+    return top
+
+
+def build_related_index(products, bought_together, limit=RELATED_LIMIT, product_ids=None):
+    """
+    Returns {product_id: [related ids]} for every product, or only for
+    `product_ids`. Candidates must be visible and in stock; they are taken from
+    the bought-together list, then from the same category, then from the rest of
+    the catalog.
+    """
+    candidates = [p for p in products if not p.is_hidden and not p.is_out_of_stock]
+    by_category = {}
+    for p in candidates:
+        by_category.setdefault(p.category_id, []).append(p.id)
+    fallback = [p.id for p in candidates]
+
+    index = {}
+    for product in products:
+        if product_ids is not None and product.id not in product_ids:
+            continue
+        ranked = [pid for pid, _ in bought_together.get(product.id, ())]
+
+        related = []
+        seen = {product.id}
+        for pool in (ranked, by_category.get(product.category_id, []), fallback):
+            for pid in pool:
+                if pid not in seen:
+                    related.append(pid)
+                    seen.add(pid)
+                    if len(related) == limit:
+                        break
+            if len(related) == limit:
+                break
+        index[product.id] = related
+    return index
+
+
+def recommend_for(bought_together, product_ids, limit=RELATED_LIMIT):
+    """Products most often bought with any of `product_ids` (e.g. a cart), excluding them."""
+    exclude = set(product_ids)
+    scores = {}
+    for product_id in exclude:
+        for other_id, orders in bought_together.get(product_id, ()):
+            if other_id not in exclude:
+                scores[other_id] = scores.get(other_id, 0) + orders
+    return sorted(scores, key=lambda pid: (-scores[pid], pid))[:limit]
@@ -0,0 +1,35 @@
+from flask import g, has_request_context
+
+# Results of idempotent reads shared by routes, context processors and template
+# helpers for the duration of one request. Outside a request nothing is memoized.
+
+
+def _stats():
+    return g.setdefault('request_memo_stats', {'hits': 0, 'misses': 0})
+
+
+def memoized(key, compute):
+    """Returns the value stored under `key` for this request, calling `compute` on the first lookup."""
+    if not has_request_context():
+        return compute()
+
+    memo = g.setdefault('request_memo', {})
+    if key in memo:
+        _stats()['hits'] += 1
+        return memo[key]
+
+    _stats()['misses'] += 1
+    value = memo[key] = compute()
+    return value
+
+
+def forget(key):
+    """Drops `key` so the next lookup in this request reads fresh data (e.g. after a write)."""
+    if has_request_context():
+        g.get('request_memo', {}).pop(key, None)
+
+
+def memo_stats():
+    if not has_request_context():
+        return {'hits': 0, 'misses': 0}
+    return dict(_stats())
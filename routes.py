@@ -1,46 +1,92 @@
-from flask import Blueprint, render_template, request, session, redirect, url_for, flash, current_app, send_file, jsonify
+from flask import Blueprint, render_template, request, session, redirect, url_for, flash, current_app, send_file, jsonify, abort, get_flashed_messages
+from flask_wtf.csrf import generate_csrf
 from flask_login import current_user
-from models import Product, db, Order, OrderItem, HomeSection, Category, UserLog, SiteSetting
+from models import db, Order, OrderItem
 from translations import get_trans
+from catalog import get_catalog, list_visible_product_ids, count_visible_products, encode_cursor, decode_cursor, SHOP_SORTS
+from search import search_product_ids, search_condition
+from pricing import get_cart_quote
+from sales import record_order_placed
+from audit_log import log_event
+from page_shell import current_lang, with_lang
+from sqlalchemy import insert
 import io
 
 main_bp = Blueprint('main', __name__)
 
+SHOP_PAGE_SIZE = 24
+SHOP_MAX_PAGE_SIZE = 60
+
 
 @main_bp.route('/set_lang/<lang_code>')
 def set_lang(lang_code):
     if lang_code in ['fr', 'ar']:
         session['lang'] = lang_code
-    return redirect(request.referrer or url_for('main.index'))
+    target = request.referrer or url_for('main.index')
+    if current_app.config.get('SHELL_MODE') and lang_code in ['fr', 'ar']:
+        # Shell pages take their language from the URL
+        target = with_lang(target, lang_code)
+    return redirect(target)
+
+@main_bp.route('/api/session-summary')
+def session_summary():
+    """Per-visitor data for shell pages: cart, user menu, pending messages and CSRF token."""
+    quote = get_cart_quote()
+
+    if current_user.is_authenticated and current_user.is_staff:
+        account_url, account_label, account_icon = url_for('admin.dashboard'), get_trans('dashboard'), 'fa-tachometer-alt'
+    elif current_user.is_authenticated:
+        account_url, account_label, account_icon = url_for('auth.profile'), get_trans('my_profile'), 'fa-user'
+    else:
+        account_url, account_label, account_icon = url_for('auth.login'), get_trans('login_register'), 'fa-user'
+
+    response = jsonify({
+        'lang': current_lang(),
+        'cart_count': len(session.get('cart') or {}),
+        'cart_total': quote.subtotal,
+        'free_shipping_threshold': quote.free_shipping_threshold,
+        'remaining_amount': quote.remaining_amount,
+        'shipping_fee': quote.shipping_fee,
+        'user_menu': {
+            'authenticated': current_user.is_authenticated,
+            'account_url': account_url,
+            'account_label': account_label,
+            'account_icon': account_icon,
+            'logout_url': url_for('auth.logout') if current_user.is_authenticated else None,
+            'logout_label': get_trans('logout'),
+        },
+        'flashes': get_flashed_messages(with_categories=True),
+        'csrf_token': generate_csrf(),
+    })
+    response.headers['Cache-Control'] = 'private, no-store'
+    response.vary.add('Cookie')
+    return response
 
 @main_bp.route('/')
 def index():
-    # Fetch all products to distribute across sections
-    all_products = Product.query.filter_by(is_hidden=False).all()
-    all_categories = Category.query.all()
+    catalog = get_catalog()
+    all_categories = catalog.categories
 
-    # Fetch Sections
-    sections = {s.section_name: s for s in HomeSection.query.all()}
+    # Sections
+    sections = catalog.home_sections
     limited_offer = sections.get('limited_offer')
 
     # Hero Slides
     hero_slides = [sections.get(f'hero_slide_{i}') for i in range(1, 4)]
 
-    # Simulate different collections
-    # In a real app, these would be filtered by date added, sales count, etc.
-    new_arrivals = all_products[:4]
-    best_sellers = all_products[4:8] if len(all_products) > 4 else all_products[:4]
-    popular_items = all_products[2:6] if len(all_products) > 6 else all_products[:4]
+    # Best sellers from the sales rollups, new arrivals by creation date (see sales.py)
+    best_sellers = catalog.best_sellers
+    new_arrivals = catalog.new_arrivals
 
-    # For the main grid
-    featured_collection = all_products[:4]
+    # The grid shows best sellers first, then new arrivals, never the whole catalog
+    best_seller_ids = {p.id for p in best_sellers}
+    featured_products = best_sellers + [p for p in new_arrivals if p.id not in best_seller_ids]
 
     return render_template('index.html',
                          new_arrivals=new_arrivals,
                          best_sellers=best_sellers,
-                         popular_items=popular_items,
-                         featured_products=featured_collection,
-                         all_products=all_products,
+                         best_seller_ids=best_seller_ids,
+                         featured_products=featured_products,
                          limited_offer=limited_offer,
                          hero_slides=hero_slides,
                          all_categories=all_categories)
@@ -49,38 +95,104 @@ def index():
 def about():
     return render_template('about.html')
 
-@main_bp.route('/shop')
-def shop():
+def _shop_page(count_total=True):
+    """
+    Resolves the shop query string (category, q, sort, per_page, after) to one page
+    of products. Returns (products, next_cursor, total, params); without
+    `count_total` a search skips counting its matches and total is None.
+    """
+    catalog = get_catalog()
     category_name = request.args.get('category')
+    search_query = request.args.get('q', '').strip()
+    sort = request.args.get('sort', 'default')
+    if sort not in SHOP_SORTS:
+        sort = 'default'
+    try:
+        per_page = min(max(int(request.args.get('per_page', SHOP_PAGE_SIZE)), 1), SHOP_MAX_PAGE_SIZE)
+    except ValueError:
+        per_page = SHOP_PAGE_SIZE
+    after = request.args.get('after')
+
+    category_id = None
     if category_name:
-        # Combine the JOIN strategy (from Current) with the hidden check (from Incoming)
-        products = Product.query.join(Category).filter(
-            Category.name == category_name,
-            Product.is_hidden == False
-        ).all()
+        category = next((c for c in catalog.categories if c.name == category_name), None)
+        category_id = category.id if category else -1
+
+    if search_query:
+        condition = search_condition(search_query)
+        if condition is None:
+            page_ids, next_cursor, total = [], None, 0
+        else:
+            if sort == 'default':
+                # Relevance order only exists in the ranking, so page through it by position
+                cursor = decode_cursor(after)
+                offset = 0
+                if cursor and len(cursor) == 1 and isinstance(cursor[0], int) and not isinstance(cursor[0], bool):
+                    offset = max(cursor[0], 0)
+                page_ids = search_product_ids(search_query, per_page + 1, offset, category_id, listed_only=True)
+                next_cursor = encode_cursor([offset + per_page]) if len(page_ids) > per_page else None
+                page_ids = page_ids[:per_page]
+            else:
+                # Seek through the matches in SQL, the index answering the match itself
+                page_ids, next_cursor = list_visible_product_ids(sort, category_id, condition, after, per_page)
+            total = count_visible_products(category_id, condition) if count_total else None
     else:
-        products = Product.query.filter_by(is_hidden=False).all()
-
-    # Get all categories
-    categories = Category.query.all()
+        if category_name:
+            total = len(catalog.products_in_category(category_name))
+        else:
+            total = len(catalog.products)
+        page_ids, next_cursor = list_visible_product_ids(sort, category_id, None, after, per_page)
+
+    products = [catalog.get_product(product_id) for product_id in page_ids]
+    products = [p for p in products if p is not None]
+
+    params = {
+        'category': category_name,
+        'q': search_query or None,
+        'sort': sort if sort != 'default' else None,
+        'per_page': per_page if per_page != SHOP_PAGE_SIZE else None,
+    }
+    return products, next_cursor, total, params
 
-    return render_template('shop.html', products=products, categories=categories, current_category=category_name)
+@main_bp.route('/shop')
+def shop():
+    products, next_cursor, total, params = _shop_page()
+    catalog = get_catalog()
+    next_url = url_for('main.shop', after=next_cursor, **params) if next_cursor else None
+    next_items_url = url_for('main.shop_items', after=next_cursor, **params) if next_cursor else None
+
+    return render_template('shop.html',
+                           products=products,
+                           categories=catalog.categories,
+                           current_category=params['category'],
+                           search_query=params['q'],
+                           current_sort=params['sort'] or 'default',
+                           total_products=total,
+                           next_url=next_url,
+                           next_items_url=next_items_url)
+
+@main_bp.route('/shop/items')
+def shop_items():
+    """Next page of the shop grid for infinite scroll: rendered cards plus the following cursor."""
+    # The grid only appends cards, so following pages never count the matches
+    products, next_cursor, _, params = _shop_page(count_total=False)
+    next_items_url = url_for('main.shop_items', after=next_cursor, **params) if next_cursor else None
+
+    return jsonify({
+        'html': render_template('shop_items.html', products=products),
+        'count': len(products),
+        'next_url': next_items_url
+    })
 
 @main_bp.route('/product/<int:product_id>')
 def product_detail(product_id):
-    product = Product.query.get_or_404(product_id)
+    catalog = get_catalog()
+    product = catalog.get_product(product_id)
+    if product is None:
+        abort(404)
 
-    # Related products strategy: Same category, exclude current
-    related_products = Product.query.filter(
-        Product.category_id == product.category_id,
-        Product.id != product.id
-    ).limit(3).all()
-
-    # Fallback to fill up to 3 items
-    if len(related_products) < 3:
-        exclude_ids = [p.id for p in related_products] + [product.id]
-        more_products = Product.query.filter(Product.id.notin_(exclude_ids)).limit(3 - len(related_products)).all()
-        related_products.extend(more_products)
+    # Precomputed with the snapshot: bought together, then same category, then the rest
+    related_products = catalog.related_products(product.id)
 
     return render_template('product_detail.html', product=product, related_products=related_products)
 
@@ -89,52 +201,18 @@ def cart():
     if 'cart' not in session:
         session['cart'] = {}
 
-    cart_items = []
-    total_price = 0
-
-    for product_id, quantity in session['cart'].items():
-        product = Product.query.get(int(product_id))
-        if product:
-            # Calculate price logic
-            item_total = product.price * quantity
-
-            # Check for quantity-based pricing
-            # Use float comparison tolerance if needed, but for now strict float equality for exact matches
-            # from seed data (e.g. 1.0, 2.0)
-            found_pricing = False
-            for pricing in product.pricings:
-                if pricing.quantity == quantity:
-                    item_total = pricing.price
-                    found_pricing = True
-                    break
-
-            # Format to 2 decimal places for display consistency
-            item_total = round(item_total, 2)
-
-            total_price += item_total
-            cart_items.append({'product': product, 'quantity': quantity, 'total': item_total})
-
-    total_price = round(total_price, 2)
-
-    # Shipping Logic
-    try:
-        threshold_setting = SiteSetting.query.filter_by(key='free_shipping_threshold').first()
-        free_shipping_threshold = float(threshold_setting.value) if threshold_setting and threshold_setting.value else 500.0
-
-        shipping_cost_setting = SiteSetting.query.filter_by(key='shipping_cost').first()
-        shipping_cost = float(shipping_cost_setting.value) if shipping_cost_setting and shipping_cost_setting.value else 35.0
-    except Exception:
-        free_shipping_threshold = 500.0
-        shipping_cost = 35.0
+    quote = get_cart_quote()
+    # Served from the in-memory top-k lists of the catalog snapshot
+    recommended_products = get_catalog().bought_with([line.product.id for line in quote.lines])
 
-    shipping_fee = 0 if total_price >= free_shipping_threshold else shipping_cost
-    grand_total = total_price + shipping_fee
-
-    return render_template('cart.html', cart_items=cart_items, total=total_price, shipping_fee=shipping_fee, grand_total=grand_total)
+    return render_template('cart.html', cart_items=quote.lines, total=quote.subtotal, shipping_fee=quote.shipping_fee, grand_total=quote.grand_total,
+                           recommended_products=recommended_products)
 
 @main_bp.route('/cart/add/<int:product_id>', methods=['GET', 'POST'])
 def add_to_cart(product_id):
-    product = Product.query.get_or_404(product_id)
+    product = get_catalog().get_product(product_id)
+    if product is None:
+        abort(404)
     if product.is_out_of_stock:
         flash(get_trans('msg_product_out_stock'), 'danger')
         return redirect(request.referrer or url_for('main.shop'))
@@ -212,87 +290,22 @@ def checkout():
     if 'cart' not in session or not session['cart']:
         return redirect(url_for('main.shop'))
 
-    cart = session['cart']
-    total_price = 0
-    order_items_preview = [] # For GET request summary
-
-    # Pre-calculate total for both GET and POST (shared logic)
-    # We need to iterate carefully.
-    # To avoid DB calls twice, we can do it in one pass if we restructure,
-    # but for simplicity, I'll keep the structure.
-
-    # Let's do a quick calculation first
-    for product_id, quantity in cart.items():
-        product = Product.query.get(int(product_id))
-        if product:
-            item_total = product.price * quantity
-            for pricing in product.pricings:
-                if pricing.quantity == quantity:
-                    item_total = pricing.price
-                    break
-            total_price += item_total
-            # For template preview
-            order_items_preview.append({'product': product, 'quantity': quantity, 'total': round(item_total, 2)})
-
-    total_price = round(total_price, 2)
-
-    # Shipping Logic
-    try:
-        threshold_setting = SiteSetting.query.filter_by(key='free_shipping_threshold').first()
-        free_shipping_threshold = float(threshold_setting.value) if threshold_setting and threshold_setting.value else 500.0
-
-        shipping_cost_setting = SiteSetting.query.filter_by(key='shipping_cost').first()
-        shipping_cost = float(shipping_cost_setting.value) if shipping_cost_setting and shipping_cost_setting.value else 35.0
-    except Exception:
-        free_shipping_threshold = 500.0
-        shipping_cost = 35.0
-
-    shipping_fee = 0 if total_price >= free_shipping_threshold else shipping_cost
-    grand_total = total_price + shipping_fee
+    # Priced once, shared with the context processor and reused for the order below
+    quote = get_cart_quote()
+    total_price = quote.subtotal
+    shipping_fee = quote.shipping_fee
+    grand_total = quote.grand_total
 
     if request.method == 'POST':
-        # Log Checkout Attempt
-        user_id = current_user.id if current_user.is_authenticated else None
-        log = UserLog(
-            user_id=user_id,
-            action='Checkout Attempt',
-            ip_address=request.remote_addr,
-            details=f"Checkout started. Cart size: {len(session['cart'])}"
-        )
-        db.session.add(log)
-        db.session.commit()
-
         name = request.form.get('name')
         phone = request.form.get('phone')
         email = request.form.get('email')
         address = request.form.get('address')
         city = request.form.get('city')
+        user_id = current_user.id if current_user.is_authenticated else None
 
-        # Re-calculate or use pre-calculated values
-        # We need to create OrderItem objects now
-        order_items = []
-        # Reuse order_items_preview? No, they are dicts, we need Model objects.
-        # But we already calculated the total price above.
-        # Let's recreate objects to be safe and clean.
-
-        for product_id, quantity in cart.items():
-            product = Product.query.get(int(product_id))
-            if product:
-                item_total = product.price * quantity
-                for pricing in product.pricings:
-                    if pricing.quantity == quantity:
-                        item_total = pricing.price
-                        break
-
-                order_item = OrderItem(
-                    product_id=product.id,
-                    product_name=product.name,
-                    quantity=quantity,
-                    unit=product.unit,
-                    price_at_purchase=item_total/quantity if quantity > 0 else 0
-                )
-                order_items.append(order_item)
-
+        # One unit of work: the order and its items share a single commit. The audit rows join
+        # it, or are queued for the background writer once it succeeds (see audit_log.py)
         new_order = Order(
             customer_name=name,
             customer_phone=phone,
@@ -300,33 +313,31 @@ def checkout():
             customer_address=address,
             customer_city=city,
             total_amount=round(grand_total, 2), # Use grand_total with shipping
-            status='Pending'
+            status='Pending',
+            user_id=user_id
         )
-
-        if current_user.is_authenticated:
-            new_order.user_id = current_user.id
-
         db.session.add(new_order)
-        db.session.commit()
-
-        for item in order_items:
-            item.order_id = new_order.id
-            db.session.add(item)
-
+        db.session.flush()  # assigns new_order.id without committing
+        record_order_placed(new_order)
+
+        if quote.lines:
+            db.session.execute(insert(OrderItem), [{
+                'order_id': new_order.id,
+                'product_id': line.product.id,
+                'product_name': line.product.name,
+                'quantity': line.quantity,
+                'unit': line.product.unit,
+                'price_at_purchase': line.unit_price
+            } for line in quote.lines])
+
+        log_event('Checkout Attempt', f"Checkout started. Cart size: {len(session['cart'])}",
+                  user_id=user_id, commit=False)
+        log_event('Checkout Success', f"Order {new_order.id} placed by {name}. Total: {total_price}",
+                  user_id=user_id, commit=False)
         db.session.commit()
 
         current_app.logger.info(f"Order created: {new_order.id} for {name} ({total_price})")
 
-        # Log Order Success
-        log_success = UserLog(
-            user_id=new_order.user_id,
-            action='Checkout Success',
-            ip_address=request.remote_addr,
-            details=f"Order {new_order.id} placed by {name}. Total: {total_price}"
-        )
-        db.session.add(log_success)
-        db.session.commit()
-
         # Clear cart
         session.pop('cart', None)
 
@@ -0,0 +1,226 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, insert, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Order, OrderItem, Product, ProductSalesDaily, DailySales, DailyCitySales
+
+# Sales rollups, kept in step with the orders in the same transaction:
+#   DailySales         orders and revenue per creation day and current status
+#   DailyCitySales     completed orders and revenue per day and city
+#   ProductSalesDaily  completed units and revenue per day and product
+# An order is counted under its status when placed and moved when the status
+# changes; its lines and city count only while it is Completed. The dashboard,
+# the revenue report and the storefront collections read these small tables,
+# never order or order_item. The catalog snapshot loads the best sellers with
+# the rest of the catalog.
+
+BEST_SELLERS_WINDOW_DAYS = 30
+COLLECTION_SIZE = 8
+REPORT_DAYS = 30
+
+
+def _order_day(order):
+    return (order.created_at or datetime.utcnow()).date()
+
+
+def normalize_city(city):
+    """'  casablanca ' and 'Casablanca' share one bucket."""
+    return ' '.join((city or '').split()).title()
+
+
+def upsert_counters(model, key_columns, rows):
+    """
+    Adds the counters of each row (a dict of key and counter values) to the
+    `model` row with the same key in one INSERT ... ON CONFLICT DO UPDATE,
+    creating missing rows, so concurrent writers never lose an increment or
+    collide on a new key. The caller deletes rows whose counts drop to zero.
+    """
+    dialect = db.session.get_bind().dialect.name
+    upsert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    stmt = upsert(model).values(rows)
+    counters = [name for name in rows[0] if name not in key_columns]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={name: getattr(model, name) + stmt.excluded[name] for name in counters}
+    )
+    db.session.execute(stmt)
+
+
+def _add(model, key, **amounts):
+    """
+    Adds `amounts` to the counters of the `model` row at `key`, creating the row
+    if needed. Rows whose order count drops to zero are removed.
+    """
+    upsert_counters(model, list(key), [{**key, **amounts}])
+
+    if amounts.get('orders', 0) < 0:
+        db.session.execute(delete(model).filter_by(**key).where(model.orders <= 0))
+
+
+def _record_completed(order, delta):
+    day = _order_day(order)
+    _add(DailyCitySales, {'day': day, 'city': normalize_city(order.customer_city)},
+         orders=delta, revenue=delta * order.total_amount)
+    record_order_sales(order, delta)
+
+
+def record_order_sales(order, delta):
+    """
+    Adds (delta=1) or removes (delta=-1) one order's lines from the product rollup
+    in the current session. The caller commits.
+    """
+    day = _order_day(order)
+    totals = {}
+    for item in order.items:
+        if item.product_id is None:
+            continue
+        quantity, revenue = totals.get(item.product_id, (0.0, 0.0))
+        totals[item.product_id] = (quantity + item.quantity, revenue + item.quantity * item.price_at_purchase)
+
+    for product_id, (quantity, revenue) in totals.items():
+        _add(ProductSalesDaily, {'product_id': product_id, 'day': day},
+             quantity=delta * quantity, revenue=delta * revenue, orders=delta)
+
+
+def record_order_placed(order):
+    """Counts a new order (flushed, with its created_at) under its status. The caller commits."""
+    _add(DailySales, {'day': _order_day(order), 'status': order.status}, orders=1, revenue=order.total_amount)
+    if order.status == 'Completed':
+        _record_completed(order, 1)
+
+
+def record_status_change(order, old_status):
+    """
+    Moves an order from `old_status` to its current status in the rollups. Call
+    after setting order.status and before committing.
+    """
+    if old_status == order.status:
+        return
+    day = _order_day(order)
+    _add(DailySales, {'day': day, 'status': old_status}, orders=-1, revenue=-order.total_amount)
+    _add(DailySales, {'day': day, 'status': order.status}, orders=1, revenue=order.total_amount)
+
+    if order.status == 'Completed':
+        _record_completed(order, 1)
+    elif old_status == 'Completed':
+        _record_completed(order, -1)
+
+
+def rebuild_sales_rollups():
+    """
+    Recomputes every rollup from the order history and returns the row counts.
+    Order and product rollups are aggregated by the database; city names are
+    normalized in Python over the already grouped rows. The caller commits.
+    """
+    day = func.date(Order.created_at)
+    for model in (DailySales, DailyCitySales, ProductSalesDaily):
+        db.session.execute(delete(model))
+
+    db.session.execute(insert(DailySales).from_select(
+        ['day', 'status', 'orders', 'revenue'],
+        db.select(day, Order.status, func.count(Order.id), func.sum(Order.total_amount))
+        .group_by(day, Order.status)
+    ))
+
+    cities = {}
+    rows = db.session.execute(
+        db.select(day, Order.customer_city, func.count(Order.id), func.sum(Order.total_amount))
+        .where(Order.status == 'Completed')
+        .group_by(day, Order.customer_city)
+    )
+    for order_day, city, orders, revenue in rows:
+        if isinstance(order_day, str):
+            order_day = datetime.strptime(order_day, '%Y-%m-%d').date()
+        key = (order_day, normalize_city(city))
+        total_orders, total_revenue = cities.get(key, (0, 0.0))
+        cities[key] = (total_orders + orders, total_revenue + revenue)
+    if cities:
+        db.session.execute(insert(DailyCitySales), [
+            {'day': d, 'city': c, 'orders': orders, 'revenue': revenue}
+            for (d, c), (orders, revenue) in cities.items()
+        ])
+
+    db.session.execute(insert(ProductSalesDaily).from_select(
+        ['product_id', 'day', 'quantity', 'revenue', 'orders'],
+        db.select(OrderItem.product_id, day, func.sum(OrderItem.quantity),
+                  func.sum(OrderItem.quantity * OrderItem.price_at_purchase),
+                  func.count(func.distinct(OrderItem.order_id)))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status == 'Completed', OrderItem.product_id.isnot(None))
+        .group_by(OrderItem.product_id, day)
+    ))
+
+    return {model.__tablename__: db.session.query(func.count()).select_from(model).scalar()
+            for model in (DailySales, DailyCitySales, ProductSalesDaily)}
+
+
+def ensure_sales_rollups():
+    """Backfills the rollups on first start after they were introduced."""
+    if db.session.query(DailySales.day).first() is not None:
+        return
+    if db.session.query(Order.id).first() is None:
+        return
+    counts = rebuild_sales_rollups()
+    db.session.commit()
+    current_app.logger.info(f"Sales rollups built: {counts}")
+
+
+def best_seller_ids(days=BEST_SELLERS_WINDOW_DAYS, limit=None, rank_by='revenue'):
+    """
+    Product ids ranked by completed sales over the last `days` days. Revenue is
+    the default because quantities mix kilograms and pieces.
+    """
+    measure = ProductSalesDaily.revenue if rank_by == 'revenue' else ProductSalesDaily.quantity
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    query = (db.session.query(ProductSalesDaily.product_id)
+             .filter(ProductSalesDaily.day >= since)
+             .group_by(ProductSalesDaily.product_id)
+             .order_by(func.sum(measure).desc(), ProductSalesDaily.product_id))
+    if limit:
+        query = query.limit(limit)
+    return [row[0] for row in query]
+
+
+def orders_by_status():
+    """{status: (orders, revenue)} over all time, from one scan of DailySales."""
+    rows = (db.session.query(DailySales.status, func.sum(DailySales.orders), func.sum(DailySales.revenue))
+            .group_by(DailySales.status))
+    return {status: (orders or 0, revenue or 0.0) for status, orders, revenue in rows}
+
+
+def revenue_report(days=REPORT_DAYS, limit=10):
+    """Completed revenue of the last `days` days: per day, per city and top products."""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+
+    per_day = {row.day: row for row in DailySales.query.filter(
+        DailySales.status == 'Completed', DailySales.day >= since
+    )}
+    daily = []
+    for offset in range(days):
+        d = since + timedelta(days=offset)
+        row = per_day.get(d)
+        daily.append({'day': d, 'orders': row.orders if row else 0, 'revenue': row.revenue if row else 0.0})
+
+    cities = (db.session.query(DailyCitySales.city, func.sum(DailyCitySales.orders).label('orders'),
+                               func.sum(DailyCitySales.revenue).label('revenue'))
+              .filter(DailyCitySales.day >= since)
+              .group_by(DailyCitySales.city)
+              .order_by(func.sum(DailyCitySales.revenue).desc())
+              .limit(limit).all())
+
+    products = (db.session.query(Product.name, func.sum(ProductSalesDaily.quantity).label('quantity'),
+                                 func.sum(ProductSalesDaily.revenue).label('revenue'))
+                .join(Product, Product.id == ProductSalesDaily.product_id)
+                .filter(ProductSalesDaily.day >= since)
+                .group_by(Product.id, Product.name)
+                .order_by(func.sum(ProductSalesDaily.revenue).desc())
+                .limit(limit).all())
+
+    return {
+        'since': since,
+        'daily': daily,
+        'orders': sum(d['orders'] for d in daily),
+        'revenue': sum(d['revenue'] for d in daily),
+        'cities': cities,
+        'products': products,
+    }
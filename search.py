@@ -0,0 +1,247 @@
+import re
+import unicodedata
+from flask import current_app
+from sqlalchemy import event, text, or_, and_, column, Integer
+from models import db, Product, Order, User
+
+# Arabic letters that have no Unicode decomposition but should match their plain form
+ARABIC_FOLDING = str.maketrans({
+    'ٱ': 'ا',  # alef wasla -> alef
+    'ى': 'ي',  # alef maksura -> yeh
+    'ة': 'ه',  # teh marbuta -> heh
+    'ـ': None,      # tatweel
+})
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize_search_text(value):
+    """
+    Folds text for accent- and diacritic-insensitive matching:
+    'Dattes Séchées (تَمْر)' -> 'dattes sechees تمر'.
+    NFKD splits Latin accents and Arabic hamza/madda from their base letter, and
+    every combining mark (including Arabic harakat) is then dropped.
+    """
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    folded = stripped.translate(ARABIC_FOLDING).casefold()
+    return ' '.join(TOKEN_RE.findall(folded))
+
+
+def build_product_search_text(product):
+    return normalize_search_text(f"{product.name or ''} {product.description or ''}")
+
+
+@event.listens_for(Product, 'before_insert')
+@event.listens_for(Product, 'before_update')
+def _refresh_search_text(mapper, connection, target):
+    target.search_text = build_product_search_text(target)
+
+
+def ensure_search_index():
+    """
+    Creates the full-text index for the current database if it is missing:
+    an FTS5 table kept in sync by triggers on SQLite, a GIN expression index on PostgreSQL.
+    """
+    dialect = db.engine.dialect.name
+
+    # Products written before the search_text column existed
+    missing = Product.query.filter(Product.search_text.is_(None)).all()
+    for product in missing:
+        product.search_text = build_product_search_text(product)
+    if missing:
+        db.session.commit()
+        current_app.logger.info(f"Search text backfilled for {len(missing)} products")
+
+    with db.engine.begin() as conn:
+        if dialect == 'sqlite':
+            exists = conn.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name='product_fts'")).fetchone()
+            if exists:
+                return
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE product_fts USING fts5("
+                "search_text, content='product', content_rowid='id')"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN "
+                "INSERT INTO product_fts(rowid, search_text) VALUES (new.id, new.search_text); END"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN "
+                "INSERT INTO product_fts(product_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); END"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF search_text ON product BEGIN "
+                "INSERT INTO product_fts(product_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+                "INSERT INTO product_fts(rowid, search_text) VALUES (new.id, new.search_text); END"
+            ))
+            conn.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+        elif dialect == 'postgresql':
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_product_search_text_fts ON product "
+                "USING GIN (to_tsvector('simple', coalesce(search_text, '')))"
+            ))
+
+
+def _fts_match(tokens):
+    return ' AND '.join(f'"{token}"*' for token in tokens)
+
+
+def _tsquery(tokens):
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def search_condition(query):
+    """
+    SQL condition on Product for the products matching every word of `query`,
+    answered by the full-text index, or None when the query has no words. Lets
+    a sorted listing seek through the matches without fetching their ids first.
+    """
+    tokens = normalize_search_text(query).split()
+    if not tokens:
+        return None
+
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        matches = (text("SELECT rowid FROM product_fts WHERE product_fts MATCH :fts_match")
+                   .bindparams(fts_match=_fts_match(tokens))
+                   .columns(column('rowid', Integer)))
+        return Product.id.in_(matches)
+    if dialect == 'postgresql':
+        return text(
+            "to_tsvector('simple', coalesce(product.search_text, '')) @@ to_tsquery('simple', :tsquery)"
+        ).bindparams(tsquery=_tsquery(tokens))
+    return and_(*[Product.search_text.like(f'%{token}%') for token in tokens])
+
+
+def search_product_ids(query, limit=None, offset=0, category_id=None, listed_only=False):
+    """
+    Returns the ids of products matching every word of `query`, best match first.
+    Each word also matches as a prefix, so 'maj' finds 'Majhoul'. `limit` and
+    `offset` select one page of the ranking; `category_id` and `listed_only`
+    (not hidden) are applied in the same query.
+    """
+    tokens = normalize_search_text(query).split()
+    if not tokens:
+        return []
+
+    dialect = db.engine.dialect.name
+    params = {'limit': limit, 'offset': offset, 'hidden': False, 'category_id': category_id}
+    filters = ''
+    if listed_only:
+        filters += ' AND product.is_hidden = :hidden'
+    if category_id is not None:
+        filters += ' AND product.category_id = :category_id'
+    page = ' LIMIT :limit OFFSET :offset' if limit is not None else ''
+
+    if dialect == 'sqlite':
+        rows = db.session.execute(
+            text(
+                "SELECT product_fts.rowid FROM product_fts JOIN product ON product.id = product_fts.rowid "
+                "WHERE product_fts MATCH :match" + filters + " ORDER BY product_fts.rank" + page
+            ),
+            {'match': _fts_match(tokens), **params}
+        )
+    elif dialect == 'postgresql':
+        rows = db.session.execute(
+            text(
+                "SELECT id FROM product "
+                "WHERE to_tsvector('simple', coalesce(search_text, '')) @@ to_tsquery('simple', :tsquery)" + filters +
+                " ORDER BY ts_rank(to_tsvector('simple', coalesce(search_text, '')), to_tsquery('simple', :tsquery)) DESC, id"
+                + page
+            ),
+            {'tsquery': _tsquery(tokens), **params}
+        )
+    else:
+        # No full-text support: plain substring match on the folded text
+        conditions = [Product.search_text.like(f'%{token}%') for token in tokens]
+        if listed_only:
+            conditions.append(Product.is_hidden == False)
+        if category_id is not None:
+            conditions.append(Product.category_id == category_id)
+        rows = db.session.query(Product.id).filter(*conditions).order_by(Product.id).limit(limit).offset(offset)
+
+    return [row[0] for row in rows]
+
+
+# Admin substring search ("%term%" anywhere in a name, phone, city or email).
+# kind -> (model, trigram table, searched columns). The indexes are FTS5 tables
+# with the trigram tokenizer on SQLite and pg_trgm GIN indexes on PostgreSQL,
+# so a substring lookup reads the index instead of scanning the table.
+SUBSTRING_INDEXES = {
+    'product': (Product, 'product_trgm', ('name',)),
+    'order': (Order, 'order_trgm', ('customer_name', 'customer_phone', 'customer_city')),
+    'user': (User, 'user_trgm', ('username', 'email')),
+}
+
+# Trigram indexes cannot answer shorter terms; those fall back to a scan.
+MIN_TRIGRAM_LENGTH = 3
+
+
+def ensure_substring_indexes():
+    """Creates the admin substring indexes for the current database if they are missing."""
+    dialect = db.engine.dialect.name
+
+    if dialect == 'sqlite':
+        with db.engine.begin() as conn:
+            for model, fts_table, columns in SUBSTRING_INDEXES.values():
+                exists = conn.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name=:name"),
+                                      {'name': fts_table}).fetchone()
+                if exists:
+                    continue
+                table = model.__tablename__
+                cols = ', '.join(columns)
+                new_values = ', '.join(f'new.{c}' for c in columns)
+                old_values = ', '.join(f'old.{c}' for c in columns)
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+                    f"{cols}, content='{table}', content_rowid='id', tokenize='trigram')"
+                ))
+                conn.execute(text(
+                    f'CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON "{table}" BEGIN '
+                    f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+                ))
+                conn.execute(text(
+                    f'CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON "{table}" BEGIN '
+                    f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END"
+                ))
+                conn.execute(text(
+                    f'CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {cols} ON "{table}" BEGIN '
+                    f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+                    f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+                ))
+                conn.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+    elif dialect == 'postgresql':
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        except Exception as e:
+            current_app.logger.warning(f"pg_trgm unavailable, admin search will scan: {e}")
+            return
+        with db.engine.begin() as conn:
+            for model, _, columns in SUBSTRING_INDEXES.values():
+                table = model.__tablename__
+                for column in columns:
+                    conn.execute(text(
+                        f'CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm ON "{table}" '
+                        f"USING GIN ({column} gin_trgm_ops)"
+                    ))
+
+
+def substring_match(kind, term):
+    """
+    Filter criterion for rows of `kind` ('product', 'order' or 'user') with `term`
+    anywhere in one of the searched columns, case-insensitively.
+    """
+    model, fts_table, columns = SUBSTRING_INDEXES[kind]
+    term = term.strip()
+
+    if db.engine.dialect.name == 'sqlite' and len(term) >= MIN_TRIGRAM_LENGTH:
+        phrase = '"' + term.replace('"', '""') + '"'
+        matches = text(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH :phrase")
+        return model.id.in_(matches.bindparams(phrase=phrase).columns(rowid=Integer))
+
+    # PostgreSQL answers ILIKE '%term%' from the pg_trgm indexes
+    return or_(*(getattr(model, column).icontains(term, autoescape=True) for column in columns))
@@ -0,0 +1,61 @@
+from flask import current_app
+from models import db, SiteSetting
+from cache_version import get_version, bump_version
+from request_memo import memoized, forget
+
+# Known site settings: key -> (type, default). Missing, empty or unparsable
+# values fall back to the default so callers never parse strings themselves.
+SETTINGS = {
+    'free_shipping_threshold': (float, 500.0),
+    'shipping_cost': (float, 35.0),
+    'meta_pixel_id': (str, '1626031432043896'),
+}
+
+
+def _parse(key, raw):
+    kind, default = SETTINGS[key]
+    if raw is None or raw == '':
+        return default
+    try:
+        return kind(raw)
+    except (TypeError, ValueError):
+        return default
+
+
+def load_settings():
+    """Reads every known setting in one query and returns them typed."""
+    rows = SiteSetting.query.filter(SiteSetting.key.in_(SETTINGS.keys())).all()
+    raw = {row.key: row.value for row in rows}
+    return {key: _parse(key, raw.get(key)) for key in SETTINGS}
+
+
+def get_settings():
+    """
+    Returns the typed settings of the current worker, reloaded only when the
+    shared settings version has moved since they were read.
+    """
+    return memoized('site_settings', _current_settings)
+
+
+def _current_settings():
+    version = get_version('settings')
+    cached = current_app.extensions.get('site_settings')
+    if cached is None or cached[0] != version:
+        cached = (version, load_settings())
+        current_app.extensions['site_settings'] = cached
+    return cached[1]
+
+
+def get_setting(key):
+    return get_settings()[key]
+
+
+def set_setting(key, value):
+    """Stores `value` for `key` in the current session and bumps the settings version. The caller commits."""
+    setting = SiteSetting.query.filter_by(key=key).first()
+    if not setting:
+        setting = SiteSetting(key=key)
+        db.session.add(setting)
+    setting.value = str(value)
+    bump_version('settings')
+    forget('site_settings')
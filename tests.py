@@ -1,6 +1,8 @@
 import unittest
 from app import create_app, db
-from models import User, Product, Order, OrderItem, Category
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import User, Product, Order, OrderItem, Category, UserLog
 
 class LuxFakiaTestCase(unittest.TestCase):
     def setUp(self):
@@ -146,6 +148,25 @@ class LuxFakiaTestCase(unittest.TestCase):
         with self.client.session_transaction() as sess:
             self.assertIsNone(sess.get('cart'))
 
+    def test_checkout_single_commit(self):
+        with self.app.app_context():
+            pid = Product.query.filter_by(name='Test').first().id
+        self.client.post(f'/cart/add/{pid}', data={'quantity': 1.0})
+
+        commits = []
+        listener = lambda session: commits.append(session)
+        event.listen(Session, 'after_commit', listener)
+        try:
+            response = self.client.post('/checkout', data={'name': 'John Doe', 'phone': '123456789'})
+        finally:
+            event.remove(Session, 'after_commit', listener)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(commits), 1)
+        with self.app.app_context():
+            actions = [log.action for log in UserLog.query.order_by(UserLog.id).all()]
+            self.assertEqual(actions, ['Checkout Attempt', 'Checkout Success'])
+
     def test_admin_orders(self):
         # Create an order
         with self.app.app_context():
@@ -1,6 +1,8 @@
+import re
 import unittest
 from app import create_app, db
-from models import User, Product, Category
+from models import User, Product, Category, ProductPricing
+from catalog import encode_cursor
 
 class AdminFilterTestCase(unittest.TestCase):
     def setUp(self):
@@ -113,5 +115,65 @@ class AdminFilterTestCase(unittest.TestCase):
         idx_banana = content.find('Banana')
         self.assertGreater(idx_apricot, idx_banana)
 
+    def test_api_products_pages(self):
+        self.login_admin()
+        with self.app.app_context():
+            category_id = Category.query.filter_by(name='Cat A').first().id
+            for i in range(120):
+                db.session.add(Product(name=f'Bulk {i:03d}', price=float(i), category_id=category_id, image_url='', unit='kg'))
+            db.session.commit()
+
+        # First page is rendered into the dashboard, with the cursor for the rest
+        response = self.client.get('/admin/?sort=price_asc')
+        self.assertEqual(len(re.findall(rb'<th scope="row" class="ps-4 text-muted">\d+</th>', response.data)), 50)
+        self.assertIn(b'data-total="123"', response.data)
+
+        names = []
+        url = '/admin/api/products?sort=price_asc'
+        while url:
+            data = self.client.get(url).get_json()
+            self.assertEqual(data['total'], 123)
+            names.extend(item['name'] for item in data['items'])
+            url = f"/admin/api/products?sort=price_asc&after={data['next_cursor']}" if data['next_cursor'] else None
+        self.assertEqual(len(names), 123)
+        self.assertEqual(len(set(names)), 123)
+
+        data = self.client.get(f'/admin/api/products?search=Apr&category={self.c1_id}').get_json()
+        self.assertEqual([item['name'] for item in data['items']], ['Apricot'])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_api_products_ignores_malformed_cursors(self):
+        self.login_admin()
+        first = [item['name'] for item in self.client.get('/admin/api/products?sort=price_asc').get_json()['items']]
+        for values in ([[1], 2], [{'a': 1}, 1], ['abc', 1], [1, 'x'], [1.5, True]):
+            after = encode_cursor(values)
+            response = self.client.get(f'/admin/api/products?sort=price_asc&after={after}')
+            self.assertEqual(response.status_code, 200, values)
+            self.assertEqual([item['name'] for item in response.get_json()['items']], first, values)
+            self.assertEqual(self.client.get(f'/admin/?after={after}').status_code, 200, values)
+
+    def test_api_products_tiers(self):
+        self.login_admin()
+        with self.app.app_context():
+            apple = Product.query.filter_by(name='Apple').first()
+            db.session.add(ProductPricing(product_id=apple.id, quantity=0.5, price=5.5, display_unit='g'))
+            db.session.add(ProductPricing(product_id=apple.id, quantity=1.0, price=10.0, display_unit='Kg'))
+            db.session.commit()
+
+        data = self.client.get('/admin/api/products?search=Apple').get_json()
+        item = data['items'][0]
+        self.assertEqual(item['tiers'], [{'label': '500g', 'price': 5.5}, {'label': '1kg', 'price': 10.0}])
+        self.assertEqual(item['category'], 'Cat A')
+        self.assertTrue(item['edit_url'].endswith(f"/admin/edit/{item['id']}"))
+
+    def test_api_products_forbidden_for_orders_only(self):
+        with self.app.app_context():
+            m = User(username='orders', role='customer', can_manage_orders=True)
+            m.set_password('password')
+            db.session.add(m)
+            db.session.commit()
+        self.client.post('/admin/login', data={'username': 'orders', 'password': 'password'})
+        self.assertEqual(self.client.get('/admin/api/products').status_code, 403)
+
 if __name__ == '__main__':
     unittest.main()
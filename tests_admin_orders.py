@@ -0,0 +1,119 @@
+import re
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app import create_app, db
+from models import User, Order
+
+class AdminOrderListTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            u = User(username='admin', role='admin')
+            u.set_password('password')
+            db.session.add(u)
+
+            # 120 orders, one per hour, alternating cities and statuses
+            start = datetime(2024, 3, 1)
+            for i in range(120):
+                db.session.add(Order(
+                    customer_name=f'Client {i:03d}',
+                    customer_phone=f'0600{i:06d}',
+                    customer_city='Rabat' if i % 2 else 'Casablanca',
+                    total_amount=100.0,
+                    status='Completed' if i % 3 == 0 else 'Pending',
+                    created_at=start + timedelta(hours=i)
+                ))
+            db.session.commit()
+
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def order_ids(self, response):
+        return [int(i) for i in re.findall(rb'/admin/orders/(\d+)"', response.data)]
+
+    def test_keyset_pages_cover_every_order_once(self):
+        seen = []
+        url = '/admin/orders'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids = self.order_ids(response)
+            self.assertLessEqual(len(ids), 50)
+            seen.extend(ids)
+            match = re.search(rb'href="(/admin/orders\?after=[^"]+)"', response.data)
+            url = match.group(1).decode().replace('&amp;', '&') if match else None
+
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_filters(self):
+        response = self.client.get('/admin/orders?status=Completed&city=rabat')
+        ids = self.order_ids(response)
+        self.assertEqual(len(ids), 20)  # odd multiples of 3 below 120
+
+        response = self.client.get('/admin/orders?date_from=2024-03-02&date_to=2024-03-02')
+        self.assertEqual(len(self.order_ids(response)), 24)
+
+        response = self.client.get('/admin/orders?q=0600000042')
+        self.assertEqual(self.order_ids(response), [43])
+
+        response = self.client.get('/admin/orders?q=06 00 00 01')
+        self.assertEqual(len(self.order_ids(response)), 20)  # 0600000100 .. 0600000119
+
+        response = self.client.get('/admin/orders?q=client 11')
+        self.assertEqual(len(self.order_ids(response)), 10)
+
+    def test_phone_search_ignores_separators_on_both_sides(self):
+        with self.app.app_context():
+            order = Order(customer_name='Formatted', customer_phone='06 61-23.45 67', total_amount=10.0)
+            db.session.add(order)
+            db.session.commit()
+            order_id = order.id
+
+        for q in ('0661234567', '06 61 23', '066-123'):
+            response = self.client.get(f'/admin/orders?q={q}')
+            self.assertEqual(self.order_ids(response), [order_id], q)
+
+    def test_orders_without_created_at_are_paged_by_id(self):
+        with self.app.app_context():
+            for i in range(60):
+                db.session.add(Order(customer_name=f'Legacy {i}', total_amount=10.0))
+            db.session.commit()
+            db.session.execute(text('UPDATE "order" SET created_at = NULL WHERE customer_name LIKE \'Legacy%\''))
+            db.session.commit()
+
+        seen = []
+        url = '/admin/orders'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(self.order_ids(response))
+            match = re.search(rb'href="(/admin/orders\?after=[^"]+)"', response.data)
+            url = match.group(1).decode().replace('&amp;', '&') if match else None
+
+        self.assertEqual(sorted(seen), list(range(1, 181)))
+
+    def test_status_filter_uses_index(self):
+        with self.app.app_context():
+            plan = db.session.execute(text(
+                'EXPLAIN QUERY PLAN SELECT id FROM "order" WHERE status = :status '
+                'ORDER BY created_at DESC, id DESC LIMIT 51'
+            ), {'status': 'Pending'}).fetchall()
+            plan = ' '.join(str(row[-1]) for row in plan)
+            self.assertIn('ix_order_status_created', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import time
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from models import User, UserLog, Product, Category, Order
+from audit_log import log_event
+
+class AuditLogTestCase(unittest.TestCase):
+    def setUp(self):
+        # A file database: the writer thread uses its own connection
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.path}',
+            'WTF_CSRF_ENABLED': False,
+            'AUDIT_LOG_ASYNC': True,
+            'AUDIT_LOG_FLUSH_MS': 50,
+            'AUDIT_LOG_BATCH_SIZE': 100
+        })
+        self.client = self.app.test_client()
+        self.writer = self.app.extensions['audit_log']
+
+        with self.app.app_context():
+            db.create_all()
+            u = User(username='admin', role='admin')
+            u.set_password('password')
+            db.session.add(u)
+            db.session.commit()
+
+        self.statements = []
+        event.listen(db.Engine, 'before_cursor_execute', self.record)
+
+    def tearDown(self):
+        event.remove(db.Engine, 'before_cursor_execute', self.record)
+        self.writer.close()
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(self.path)
+
+    def record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def logs(self):
+        with self.app.app_context():
+            return UserLog.query.order_by(UserLog.id).all()
+
+    def test_events_are_written_in_batches(self):
+        with self.app.test_request_context('/login', environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+            for i in range(250):
+                log_event('Login Failed', f'attempt {i}')
+
+        self.writer.close()
+        logs = self.logs()
+        self.assertEqual([log.details for log in logs], [f'attempt {i}' for i in range(250)])
+        self.assertEqual(logs[0].ip_address, '10.0.0.1')
+
+        # Multi-row inserts of up to 100 rows, one commit each, instead of 250 commits
+        inserts = [s for s in self.statements if s.startswith('INSERT INTO user_log')]
+        self.assertLessEqual(len(inserts), 6)
+
+    def test_failed_logins_are_logged(self):
+        for i in range(3):
+            response = self.client.post('/login', data={'username': 'admin', 'password': f'wrong{i}'})
+            self.assertEqual(response.status_code, 200)
+
+        self.writer.close()
+        logs = self.logs()
+        self.assertEqual([log.action for log in logs], ['Login Failed'] * 3)
+        self.assertEqual(logs[0].details, 'Failed login attempt for username/email: admin')
+
+    def test_checkout_success_is_queued_after_the_commit(self):
+        with self.app.app_context():
+            category = Category(name='Dates')
+            db.session.add(category)
+            db.session.flush()
+            product = Product(name='Majhoul', price=10.0, category_id=category.id, image_url='', unit='Kg')
+            db.session.add(product)
+            db.session.commit()
+            pid = product.id
+
+        def fail(session):
+            raise RuntimeError('database unavailable')
+
+        self.client.post(f'/cart/add/{pid}', data={'quantity': 1})
+        event.listen(db.session, 'before_commit', fail)
+        try:
+            with self.assertRaises(RuntimeError):
+                self.client.post('/checkout', data={'name': 'John Doe', 'phone': '123456789'})
+        finally:
+            event.remove(db.session, 'before_commit', fail)
+
+        response = self.client.post('/checkout', data={'name': 'John Doe', 'phone': '123456789'})
+        self.assertEqual(response.status_code, 302)
+
+        self.writer.close()
+        with self.app.app_context():
+            order = Order.query.one()
+        # Nothing from the failed attempt, which placed no order
+        self.assertEqual([(log.action, log.details) for log in self.logs()], [
+            ('Checkout Attempt', 'Checkout started. Cart size: 1'),
+            ('Checkout Success', f'Order {order.id} placed by John Doe. Total: 10.0'),
+        ])
+
+    def test_events_are_flushed_after_the_interval(self):
+        self.client.post('/login', data={'username': 'admin', 'password': 'password'})
+
+        deadline = time.monotonic() + 5
+        while not self.logs() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual([log.action for log in self.logs()], ['Login Successful'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from sqlalchemy import event, text
+from app import create_app, db
+from models import User, Product, Category, ProductPricing, SiteSetting
+from cache_version import bump_version
+
+class CatalogSnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+            'CACHE_VERSION_TTL': 60
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            u = User(username='admin', role='admin')
+            u.set_password('password')
+            db.session.add(u)
+
+            c = Category(name='Dates')
+            db.session.add(c)
+            db.session.commit()
+
+            p = Product(name='Majhoul', price=120.0, category_id=c.id, image_url='', unit='Kg')
+            db.session.add(p)
+            db.session.commit()
+
+            db.session.add(ProductPricing(product_id=p.id, quantity=0.5, price=63.0, display_unit='g'))
+            db.session.commit()
+            self.product_id = p.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def count_queries(self, path):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = self.client.get(path)
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        self.assertEqual(response.status_code, 200)
+        return [s for s in statements if 'product' in s.lower() or 'category' in s.lower()]
+
+    def test_snapshot_is_reused_between_requests(self):
+        # First hit loads the snapshot
+        self.count_queries('/shop')
+
+        # Warm hits do not touch the catalog tables again, apart from the
+        # id-only page query of the shop grid
+        shop_queries = self.count_queries('/shop')
+        self.assertEqual(len(shop_queries), 1)
+        self.assertNotIn('product_pricing', shop_queries[0])
+        self.assertEqual(self.count_queries('/'), [])
+        self.assertEqual(self.count_queries(f'/product/{self.product_id}'), [])
+
+    def test_admin_write_bumps_version(self):
+        product_link = f'href="/product/{self.product_id}"'.encode()
+        response = self.client.get('/shop')
+        self.assertIn(product_link, response.data)
+
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+        self.client.post(f'/admin/product/{self.product_id}/toggle_hidden')
+
+        response = self.client.get('/shop')
+        self.assertNotIn(product_link, response.data)
+
+        # Hidden products stay reachable by direct link
+        response = self.client.get(f'/product/{self.product_id}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_concurrent_bumps_are_not_lost(self):
+        with self.app.app_context():
+            first = bump_version('catalog')
+            db.session.commit()
+            # This session holds the row as it was; another worker then bumps and commits
+            held = SiteSetting.query.filter_by(key='catalog_version').one()
+            db.session.execute(text("UPDATE site_setting SET value = :v WHERE key = 'catalog_version'"),
+                               {'v': str(first + 1)})
+            self.assertEqual(bump_version('catalog'), first + 2)
+            db.session.commit()
+            self.assertEqual(held.value, str(first + 2))
+
+    def test_unknown_product_is_404(self):
+        response = self.client.get('/product/9999')
+        self.assertEqual(response.status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
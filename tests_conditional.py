@@ -0,0 +1,123 @@
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from models import User, Product, Category, SiteSetting
+from cache_version import bump_version
+
+class ConditionalRequestsTestCase(unittest.TestCase):
+    shell_mode = False
+
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+            'CACHE_VERSION_TTL': 0,
+            'SHELL_MODE': self.shell_mode
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            u = User(username='admin', role='admin')
+            u.set_password('password')
+            db.session.add(u)
+            c = Category(name='Dates')
+            db.session.add(c)
+            db.session.commit()
+            p = Product(name='Majhoul', price=120.0, category_id=c.id, unit='Kg')
+            db.session.add(p)
+            db.session.commit()
+            self.product_id = p.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_not_modified_before_rendering(self):
+        first = self.client.get('/shop')
+        etag = first.headers['ETag']
+        self.assertIsNotNone(first.headers.get('Last-Modified'))
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                second = self.client.get('/shop', headers={'If-None-Match': etag})
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+        self.assertEqual(second.headers['ETag'], etag)
+        # Only the version check
+        self.assertEqual(len(statements), 1)
+        self.assertIn('site_setting', statements[0])
+
+    def test_etag_follows_catalog_and_language(self):
+        etag = self.client.get('/shop').headers['ETag']
+
+        other = self.app.test_client()
+        other.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+        other.post(f'/admin/product/{self.product_id}/toggle_hidden')
+
+        response = self.client.get('/shop', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+        etag = response.headers['ETag']
+        self.client.get('/set_lang/ar')
+        path = '/shop?lang=ar' if self.shell_mode else '/shop'
+        self.assertEqual(self.client.get(path, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_cart_changes_etag(self):
+        etag = self.client.get('/shop').headers['ETag']
+        self.client.post(f'/cart/add/{self.product_id}', data={'quantity': 1.0})
+        self.client.get('/cart')  # consume the flash
+        response = self.client.get('/shop', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+
+class ShellConditionalRequestsTestCase(ConditionalRequestsTestCase):
+    shell_mode = True
+
+    def test_cart_changes_etag(self):
+        # Shell pages do not embed the cart: the tag stays valid
+        etag = self.client.get('/shop').headers['ETag']
+        self.client.post(f'/cart/add/{self.product_id}', data={'quantity': 1.0})
+        response = self.client.get('/shop', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/shop').headers['Last-Modified']
+        response = self.client.get('/shop', headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
+
+    def test_any_catalog_write_moves_last_modified(self):
+        last_modified = self.client.get('/shop').headers['Last-Modified']
+
+        # Deleting a product changes no remaining row; the version bump still counts
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+        self.client.post(f'/admin/delete/{self.product_id}')
+        self.client.get('/admin/logout')
+
+        response = self.client.get('/shop', headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['Last-Modified'], last_modified)
+
+    def test_recommendation_bumps_do_not_move_last_modified(self):
+        last_modified = self.client.get('/shop').headers['Last-Modified']
+        with self.app.app_context():
+            # A burst of order confirmations
+            for _ in range(20):
+                bump_version('recommendations')
+            db.session.commit()
+            self.assertIsNone(SiteSetting.query.filter_by(key='recommendations_version_at').first())
+        self.assertEqual(self.client.get('/shop').headers['Last-Modified'], last_modified)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import io
+import subprocess
+import sys
+import unittest
+
+class ImageServiceTestCase(unittest.TestCase):
+    def test_app_starts_without_image_libraries(self):
+        code = (
+            "import sys\n"
+            "from app import create_app\n"
+            "app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})\n"
+            "app.test_client().get('/shop')\n"
+            "print(sorted({m.split('.')[0] for m in sys.modules} & {'PIL', 'cloudinary'}))\n"
+        )
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], '[]')
+
+    def test_images_are_scaled_to_webp(self):
+        from PIL import Image
+        from image_service import _to_webp, MAX_WIDTH
+
+        source = io.BytesIO()
+        Image.new('RGB', (2048, 1024), 'red').save(source, format='PNG')
+        source.seek(0)
+
+        img = Image.open(_to_webp(source))
+        self.assertEqual(img.format, 'WEBP')
+        self.assertEqual(img.size, (MAX_WIDTH, 512))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from sqlalchemy import text
+from app import create_app, db
+from fix_db import run_db_fix, declared_indexes, OBSOLETE_INDEXES
+
+class DeclaredIndexesTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.uri = f'sqlite:///{self.path}'
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': self.uri,
+            'WTF_CSRF_ENABLED': False
+        })
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(self.path)
+
+    def indexes(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        finally:
+            conn.close()
+
+    def test_fix_db_creates_declared_and_drops_obsolete_indexes(self):
+        declared = {name for _, name, _ in declared_indexes('sqlite')}
+
+        # A database created before the indexes were declared
+        conn = sqlite3.connect(self.path)
+        for name in declared:
+            conn.execute(f'DROP INDEX IF EXISTS {name}')
+        conn.execute('CREATE INDEX ix_product_category_visible ON product (category_id, is_hidden, price, id)')
+        conn.commit()
+        conn.close()
+        self.assertFalse(declared & self.indexes())
+
+        run_db_fix(self.uri)
+        run_db_fix(self.uri)  # idempotent
+
+        present = self.indexes()
+        self.assertLessEqual(declared, present)
+        self.assertFalse(set(OBSOLETE_INDEXES) & present)
+
+    def plan(self, sql, **params):
+        with self.app.app_context():
+            rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql), params).fetchall()
+        return ' '.join(str(row[-1]) for row in rows)
+
+    def test_hot_filters_use_indexes(self):
+        plan = self.plan('SELECT id FROM product WHERE is_hidden = 0 AND category_id = :c ORDER BY price, id LIMIT 25', c=1)
+        self.assertIn('ix_product_visible_category', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+        plan = self.plan('SELECT id FROM user_log ORDER BY timestamp DESC LIMIT 100')
+        self.assertIn('ix_user_log_timestamp', plan)
+
+        plan = self.plan('SELECT id FROM product_pricing WHERE product_id IN (1, 2) ORDER BY product_id, quantity')
+        self.assertIn('ix_product_pricing_product', plan)
+
+        plan = self.plan('UPDATE order_item SET product_id = NULL WHERE product_id = :p', p=1)
+        self.assertIn('ix_order_item_product', plan)
+
+    def test_index_report(self):
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['index-report'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('ix_product_visible_category', result.output)
+        self.assertNotIn('MISSING', result.output)
+
+        conn = sqlite3.connect(self.path)
+        conn.execute('DROP INDEX ix_user_log_timestamp')
+        conn.commit()
+        conn.close()
+        result = runner.invoke(args=['index-report'])
+        self.assertRegex(result.output, r'ix_user_log_timestamp\s+MISSING')
+
+if __name__ == '__main__':
+    unittest.main()
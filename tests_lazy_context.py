@@ -0,0 +1,73 @@
+import unittest
+from flask import render_template_string
+from sqlalchemy import event
+from app import create_app, db
+from models import Product, Category
+
+class LazyContextTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+            'CACHE_VERSION_TTL': 60,
+            'TEMPLATE_CONTEXT_DEBUG': True
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            c = Category(name='Dates')
+            db.session.add(c)
+            db.session.commit()
+            p = Product(name='Majhoul', price=120.0, category_id=c.id, unit='Kg')
+            db.session.add(p)
+            db.session.commit()
+            self.product_id = p.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_untouched_values_cost_nothing(self):
+        self.client.post(f'/cart/add/{self.product_id}', data={'quantity': 1.0})
+        # Warm the catalog snapshot and settings
+        self.client.get('/shop')
+
+        with self.app.test_request_context('/'):
+            statements = []
+            def record(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                html = render_template_string('{{ current_lang }}')
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+
+        self.assertEqual(html, 'fr')
+        self.assertEqual(statements, [])
+
+    def test_values_are_memoized(self):
+        with self.app.test_request_context('/'):
+            html = render_template_string('{{ shipping_fee }}/{{ shipping_fee }}/{{ cart_total }}')
+        self.assertEqual(html, '35.0/35.0/0')
+
+    def test_header_lists_touched_values(self):
+        response = self.client.get('/cart')
+        header = response.headers['X-Template-Context']
+        self.assertTrue(header.startswith('cart.html='))
+        self.assertIn('all_categories', header)
+        self.assertIn('meta_pixel_id', header)
+        self.assertNotIn('cart_total', header)
+
+    def test_memo_counters(self):
+        response = self.client.get('/cart')
+        hits, misses = [int(part.split('=')[1]) for part in response.headers['X-Request-Memo'].split(', ')]
+        self.assertGreater(misses, 0)
+        # The versions, settings and snapshot are shared by every lookup after the first
+        self.assertGreater(hits, 0)
+
+if __name__ == '__main__':
+    unittest.main()
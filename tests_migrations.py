@@ -0,0 +1,120 @@
+import os
+import hashlib
+import inspect
+import tempfile
+import unittest
+from sqlalchemy import event, text
+from app import create_app, db
+from models import SchemaMigration
+from migrations import MIGRATIONS, LATEST_VERSION, schema_version
+from settings import get_setting, set_setting
+
+class MigrationTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        os.remove(self.path)
+        self.apps = []
+
+    def tearDown(self):
+        for app in self.apps:
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def boot(self, auto_migrate):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.path}',
+            'WTF_CSRF_ENABLED': False,
+            'AUTO_MIGRATE': auto_migrate
+        })
+        self.apps.append(app)
+        return app
+
+    def test_boot_waits_for_the_cli_when_auto_migrate_is_off(self):
+        app = self.boot(auto_migrate=False)
+        with app.app_context():
+            self.assertEqual(schema_version(), 0)
+
+        result = app.test_cli_runner().invoke(args=['db-upgrade'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn(f'{LATEST_VERSION} migration(s) applied', result.output)
+        with app.app_context():
+            self.assertEqual(schema_version(), LATEST_VERSION)
+
+        result = app.test_cli_runner().invoke(args=['db-upgrade'])
+        self.assertIn('Schema is up to date.', result.output)
+
+    def test_current_schema_boots_with_one_query(self):
+        self.boot(auto_migrate=True)
+
+        statements = []
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.Engine, 'before_cursor_execute', count)
+        try:
+            self.boot(auto_migrate=True)
+        finally:
+            event.remove(db.Engine, 'before_cursor_execute', count)
+        self.assertEqual(len(statements), 1, statements)
+
+    def test_normalized_phone_is_backfilled(self):
+        app = self.boot(auto_migrate=True)
+        with app.app_context():
+            # A database from before the column: an order with a formatted phone, step 7 not applied
+            db.session.execute(text('DROP INDEX ix_order_customer_phone_normalized'))
+            db.session.execute(text('ALTER TABLE "order" DROP COLUMN customer_phone_normalized'))
+            db.session.execute(text(
+                'INSERT INTO "order" (customer_name, customer_phone, total_amount, status) '
+                "VALUES ('Client', '06 61-23.45 67', 100.0, 'Pending')"
+            ))
+            SchemaMigration.query.filter_by(version=7).delete()
+            db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['db-upgrade'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        with app.app_context():
+            self.assertEqual(db.session.execute(text(
+                'SELECT customer_phone_normalized FROM "order"')).scalar(), '0661234567')
+            indexes = {row[1] for row in db.session.execute(text('PRAGMA index_list("order")'))}
+            self.assertIn('ix_order_customer_phone_normalized', indexes)
+
+    def test_settings_survive_restarts(self):
+        app = self.boot(auto_migrate=True)
+        with app.app_context():
+            set_setting('meta_pixel_id', '42')
+            db.session.commit()
+
+        app = self.boot(auto_migrate=True)
+        with app.app_context():
+            self.assertEqual(get_setting('meta_pixel_id'), '42')
+
+    def test_edited_migration_is_reported(self):
+        app = self.boot(auto_migrate=True)
+        with app.app_context():
+            SchemaMigration.query.filter_by(version=2).update({'checksum': 'stale'})
+            db.session.commit()
+
+        runner = app.test_cli_runner()
+        self.assertRegex(runner.invoke(args=['db-status']).output, r'2\s+changed')
+
+        result = runner.invoke(args=['db-upgrade'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('--repair', result.output)
+
+        result = runner.invoke(args=['db-upgrade', '--repair'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertNotIn('changed', runner.invoke(args=['db-status']).output)
+
+    def test_baseline_checksum_covers_fix_db(self):
+        # An edit to fix_db.py changes the baseline step as much as an edit to its own body
+        import fix_db
+        baseline = next(step for step in MIGRATIONS if step.version == 1)
+        sources = inspect.getsource(baseline.apply) + '\n' + inspect.getsource(fix_db)
+        self.assertEqual(baseline.checksum, hashlib.sha256(sources.encode('utf-8')).hexdigest())
+
+if __name__ == '__main__':
+    unittest.main()
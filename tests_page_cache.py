@@ -0,0 +1,131 @@
+import os
+import re
+import time
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from models import User, Product, Category
+from page_cache import FileSystemBackend
+
+class PageCacheTestCase(unittest.TestCase):
+    backend = 'memory'
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+            'CACHE_VERSION_TTL': 0,
+            'PAGE_CACHE_BACKEND': self.backend,
+            'PAGE_CACHE_DIR': self.cache_dir
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            u = User(username='admin', role='admin')
+            u.set_password('password')
+            db.session.add(u)
+            c = Category(name='Dates')
+            db.session.add(c)
+            db.session.commit()
+            p = Product(name='Majhoul', price=120.0, category_id=c.id, unit='Kg')
+            db.session.add(p)
+            db.session.commit()
+            self.product_id = p.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_hit_skips_rendering(self):
+        first = self.client.get('/shop')
+        self.assertEqual(first.headers['X-Page-Cache'], 'MISS')
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                second = self.client.get('/shop')
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+
+        self.assertEqual(second.headers['X-Page-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        # Only the shared version check, no catalog or template work
+        self.assertEqual(len(statements), 1)
+        self.assertIn('site_setting', statements[0])
+
+    def test_keyed_by_language(self):
+        self.client.get('/shop')
+        self.client.get('/set_lang/ar')
+        response = self.client.get('/shop')
+        self.assertEqual(response.headers['X-Page-Cache'], 'MISS')
+        self.assertIn(b'dir="rtl"', response.data)
+
+    def test_catalog_edit_invalidates(self):
+        self.client.get('/shop')
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+        self.client.post(f'/admin/product/{self.product_id}/toggle_hidden')
+
+        other = self.app.test_client()
+        response = other.get('/shop')
+        self.assertEqual(response.headers['X-Page-Cache'], 'MISS')
+        self.assertNotIn(f'href="/product/{self.product_id}"'.encode(), response.data)
+
+    def test_cart_holder_bypasses(self):
+        self.client.get('/shop')
+        self.client.post(f'/cart/add/{self.product_id}', data={'quantity': 1.0})
+        self.client.get('/cart')  # consume the flash
+        response = self.client.get('/shop')
+        self.assertNotIn('X-Page-Cache', response.headers)
+
+    def test_csrf_token_is_per_visitor(self):
+        path = f'/product/{self.product_id}'
+        self.client.get(path)
+        other = self.app.test_client()
+        response = other.get(path)
+        self.assertEqual(response.headers['X-Page-Cache'], 'HIT')
+
+        html = response.data.decode('utf-8')
+        self.assertNotIn('__PAGE_CACHE_CSRF_TOKEN__', html)
+        token = re.search(r'name="csrf_token" value="([^"]+)"', html).group(1)
+        first_token = re.search(r'name="csrf_token" value="([^"]+)"',
+                                self.client.get(path).data.decode('utf-8')).group(1)
+        self.assertNotEqual(token, first_token)
+
+    def test_unknown_query_parameters_share_the_entry(self):
+        self.client.get('/shop?sort=name-asc')
+        response = self.client.get('/shop?utm_source=mail&sort=name-asc&x=123')
+        self.assertEqual(response.headers['X-Page-Cache'], 'HIT')
+        response = self.client.get('/shop?sort=price-asc')
+        self.assertEqual(response.headers['X-Page-Cache'], 'MISS')
+
+class FileSystemPageCacheTestCase(PageCacheTestCase):
+    backend = 'filesystem'
+
+    def test_expired_and_surplus_entries_are_pruned(self):
+        backend = FileSystemBackend(self.cache_dir, timeout=300, max_entries=8)
+        entry = {'content_type': 'text/html', 'body': b'<p>page</p>'}
+        backend.set('stale', entry)
+        stale = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        os.utime(stale, (time.time() - 600, time.time() - 600))
+
+        for i in range(20):
+            backend.set(f'page-{i}', entry)
+
+        names = os.listdir(self.cache_dir)
+        self.assertLessEqual(len(names), 8 + backend._prune_every)
+        self.assertNotIn(os.path.basename(stale), names)
+        self.assertIsNotNone(backend.get('page-19'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from app import create_app, db
+from models import Product, Category
+
+class PageShellTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+            'SHELL_MODE': True
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            c = Category(name='Dates')
+            db.session.add(c)
+            db.session.commit()
+            p = Product(name='Majhoul', price=120.0, category_id=c.id, unit='Kg')
+            db.session.add(p)
+            db.session.commit()
+            self.product_id = p.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_shell_is_shareable(self):
+        # A visitor with a cart and a pending message still gets the shared page
+        self.client.post(f'/cart/add/{self.product_id}', data={'quantity': 1.0})
+        response = self.client.get(f'/product/{self.product_id}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response.headers['Cache-Control'])
+        self.assertNotIn('Cookie', response.headers.get('Vary', ''))
+        self.assertNotIn('Set-Cookie', response.headers)
+        self.assertIn(b'name="csrf_token" value=""', response.data)
+        self.assertNotIn(b'data-bs-delay="5000"', response.data)
+
+    def test_summary_carries_visitor_state(self):
+        self.client.post(f'/cart/add/{self.product_id}', data={'quantity': 0.5})
+        response = self.client.get('/api/session-summary')
+        data = response.get_json()
+
+        self.assertIn('no-store', response.headers['Cache-Control'])
+        self.assertIn('Cookie', response.headers['Vary'])
+        self.assertEqual(data['cart_count'], 1)
+        self.assertEqual(data['cart_total'], 60.0)
+        self.assertEqual(data['remaining_amount'], 440.0)
+        self.assertFalse(data['user_menu']['authenticated'])
+        self.assertEqual(len(data['flashes']), 1)
+        self.assertTrue(data['csrf_token'])
+
+        # Messages are handed out once
+        self.assertEqual(self.client.get('/api/session-summary').get_json()['flashes'], [])
+
+    def test_language_in_url(self):
+        response = self.client.get('/set_lang/ar', headers={'Referer': 'http://localhost/shop?category=Dates'})
+        self.assertEqual(response.headers['Location'], 'http://localhost/shop?category=Dates&lang=ar')
+
+        response = self.client.get('/shop?category=Dates&lang=ar')
+        self.assertIn(b'dir="rtl"', response.data)
+        self.assertIn(b'href="/product/%d?lang=ar"' % self.product_id, response.data)
+
+        # The URL decides, not the session
+        response = self.client.get('/shop')
+        self.assertIn(b'dir="ltr"', response.data)
+        self.assertEqual(self.client.get('/api/session-summary').get_json()['lang'], 'ar')
+
+if __name__ == '__main__':
+    unittest.main()
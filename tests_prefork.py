@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+from app import create_app, db
+from models import Category, Product
+from prefork import warm_up, reset_after_fork, process_memory
+
+class PreforkTestCase(unittest.TestCase):
+    def setUp(self):
+        # A file database: the engine is disposed, which would empty an in-memory one
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.path}',
+            'WTF_CSRF_ENABLED': False
+        })
+        with self.app.app_context():
+            db.create_all()
+            c = Category(name='Dates')
+            db.session.add(c)
+            db.session.commit()
+            db.session.add(Product(name='Majhoul', price=100.0, category_id=c.id, image_url='', unit='Kg'))
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(self.path)
+
+    def test_warm_up_compiles_templates_and_loads_catalog(self):
+        templates = warm_up(self.app)
+        self.assertGreater(templates, 0)
+        self.assertIn('catalog_snapshot', self.app.extensions)
+        self.assertEqual(len(self.app.extensions['catalog_snapshot'].by_id), 1)
+
+        # Already compiled: the loader is not consulted again
+        cache_size = len(self.app.jinja_env.cache)
+        self.app.jinja_env.get_template('shop.html')
+        self.assertEqual(len(self.app.jinja_env.cache), cache_size)
+
+        reset_after_fork(self.app)
+        self.assertEqual(self.app.test_client().get('/shop').status_code, 200)
+
+    def test_process_memory(self):
+        memory = process_memory()
+        if not memory:
+            self.skipTest('/proc not available')
+        self.assertLessEqual(memory['private'], memory['rss'])
+
+class TemplateCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_app(self):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'TEMPLATE_CACHE_DIR': self.directory
+        })
+        with app.app_context():
+            db.create_all()
+        return app
+
+    def test_precompiled_templates_are_not_compiled_again(self):
+        result = self.create_app().test_cli_runner().invoke(args=['precompile-templates'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertTrue(os.listdir(self.directory))
+
+        # A new worker loads the bytecode instead of compiling the sources
+        app = self.create_app()
+        compiled = []
+        compile_source = app.jinja_env.compile
+        app.jinja_env.compile = lambda *args, **kwargs: compiled.append(args) or compile_source(*args, **kwargs)
+        self.assertEqual(app.test_client().get('/shop').status_code, 200)
+        self.assertEqual(compiled, [])
+
+    def test_disabled_in_tests_by_default(self):
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.assertIsNone(app.jinja_env.bytecode_cache)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from app import create_app, db
+from models import Product, Category, ProductPricing, Order, OrderItem
+from pricing import PricingEngine, quantity_key
+
+class PricingEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            c = Category(name='Dates')
+            db.session.add(c)
+            db.session.commit()
+
+            p = Product(name='Majhoul', price=120.0, category_id=c.id, unit='Kg')
+            db.session.add(p)
+            db.session.commit()
+
+            # Tier prices are cheaper than price * quantity
+            db.session.add_all([
+                ProductPricing(product_id=p.id, quantity=0.25, price=32.0, display_unit='g'),
+                ProductPricing(product_id=p.id, quantity=0.75, price=95.0, display_unit='g'),
+            ])
+            db.session.commit()
+            self.product_id = p.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_quantity_key(self):
+        self.assertEqual(quantity_key(0.25), 250)
+        # Float noise from the browser no longer misses the tier
+        self.assertEqual(quantity_key(0.1 + 0.65), 750)
+
+    def test_tier_and_base_prices(self):
+        with self.app.app_context():
+            product = db.session.get(Product, self.product_id)
+            engine = PricingEngine()
+            self.assertEqual(engine.line_total(product, 0.25), 32.0)
+            self.assertEqual(engine.line_total(product, 0.1 + 0.65), 95.0)
+            # No tier for 2 Kg: base price per unit
+            self.assertEqual(engine.line_total(product, 2.0), 240.0)
+
+    def test_quote_batches_unknown_products(self):
+        with self.app.app_context():
+            quote = PricingEngine().quote({str(self.product_id): 0.25, '999': 1.0}, 500.0, 35.0)
+            self.assertEqual(len(quote.lines), 1)
+            self.assertEqual(quote.subtotal, 32.0)
+            self.assertEqual(quote.shipping_fee, 35.0)
+            self.assertEqual(quote.grand_total, 67.0)
+            self.assertEqual(quote.remaining_amount, 468.0)
+
+    def test_checkout_uses_tier_price(self):
+        self.client.post(f'/cart/add/{self.product_id}', data={'quantity': 0.75})
+
+        response = self.client.get('/cart')
+        self.assertIn(b'95.0 MAD', response.data)
+
+        self.client.post('/checkout', data={'name': 'Salma', 'phone': '0600000000'})
+        with self.app.app_context():
+            order = Order.query.first()
+            self.assertEqual(order.total_amount, 130.0)
+            item = OrderItem.query.filter_by(order_id=order.id).first()
+            self.assertAlmostEqual(item.price_at_purchase * item.quantity, 95.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from contextlib import contextmanager
+from sqlalchemy import event
+from app import create_app, db
+from models import User, Product, Category, ProductPricing, Order, OrderItem, UserLog
+
+class QueryCountMixin:
+    """Counts the SQL statements an endpoint issues."""
+
+    @contextmanager
+    def record_queries(self):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    def assertMaxQueries(self, path, limit):
+        with self.record_queries() as statements:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        self.assertLessEqual(len(statements), limit,
+                             f"{path} ran {len(statements)} queries:\n" + '\n'.join(statements))
+        return response
+
+class QueryCountTestCase(QueryCountMixin, unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+            'CACHE_VERSION_TTL': 60
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            admin = User(username='admin', role='admin')
+            admin.set_password('password')
+            db.session.add(admin)
+
+            categories = [Category(name=f'Category {i}') for i in range(5)]
+            db.session.add_all(categories)
+            db.session.commit()
+
+            for i in range(200):
+                product = Product(name=f'Product {i}', price=10.0 + i, unit='Kg',
+                                  category_id=categories[i % 5].id)
+                product.pricings = [ProductPricing(quantity=0.5, price=5.0 + i, display_unit='g'),
+                                    ProductPricing(quantity=1.0, price=9.0 + i, display_unit='Kg')]
+                db.session.add(product)
+            db.session.commit()
+
+            order = Order(customer_name='Client', total_amount=100.0)
+            db.session.add(order)
+            db.session.flush()
+            for i in range(20):
+                db.session.add(OrderItem(order_id=order.id, product_id=i + 1, product_name=f'Product {i}',
+                                         quantity=1.0, unit='Kg', price_at_purchase=10.0))
+            for i in range(30):
+                db.session.add(UserLog(user_id=admin.id, action='Login'))
+            db.session.commit()
+            self.order_id = order.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self):
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+
+    def test_shop(self):
+        # Cold: version check, snapshot (categories, products, pricings, home sections,
+        # co-purchases, best sellers), site settings and the page of ids
+        self.assertMaxQueries('/shop?per_page=60', 9)
+        # Warm: the page of ids only
+        self.assertMaxQueries('/shop?per_page=60', 1)
+
+    def test_index_and_product(self):
+        self.assertMaxQueries('/', 8)
+        self.assertMaxQueries('/product/42', 0)
+
+    def test_admin_dashboard(self):
+        self.login()
+        # Session user, product table with categories, category filter and the stat counters
+        self.assertMaxQueries('/admin/', 10)
+
+    def test_admin_order_detail_and_logs(self):
+        self.login()
+        self.assertMaxQueries(f'/admin/orders/{self.order_id}', 3)
+        self.assertMaxQueries('/admin/logs', 2)
+        # Session user, one page of orders and the status counts from the rollup
+        self.assertMaxQueries('/admin/orders', 3)
+
+    def test_admin_edit_product(self):
+        self.login()
+        self.assertMaxQueries('/admin/edit/7', 4)
+
+    def test_no_duplicate_selects(self):
+        self.client.post('/cart/add/3', data={'quantity': 1.0})
+        paths = ['/', '/shop', '/product/3', '/cart', '/checkout', '/about', '/api/session-summary']
+        for path in paths:
+            with self.record_queries() as statements:
+                self.client.get(path)
+            selects = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+            self.assertEqual(len(selects), len(set(selects)), path)
+
+if __name__ == '__main__':
+    unittest.main()
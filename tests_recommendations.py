@@ -0,0 +1,184 @@
+import unittest
+from sqlalchemy import text
+from app import create_app, db
+from catalog import get_catalog
+from cache_version import get_version, bump_version
+from models import User, Product, Category, Order, OrderItem, ProductCooccurrence, CooccurrenceChange, SiteSetting
+from recommendations import rebuild_cooccurrence, publish_changes, changed_since
+
+class RelatedProductsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+            'CACHE_VERSION_TTL': 0
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            u = User(username='admin', role='admin')
+            u.set_password('password')
+            db.session.add(u)
+
+            dates = Category(name='Dates')
+            oils = Category(name='Oils')
+            db.session.add_all([dates, oils])
+            db.session.commit()
+
+            def product(name, category, **kwargs):
+                p = Product(name=name, price=10.0, category_id=category.id, image_url='', unit='Kg', **kwargs)
+                db.session.add(p)
+                return p
+
+            self.majhoul = product('Majhoul', dates)
+            self.boufeggous = product('Boufeggous', dates)
+            self.aziza = product('Aziza', dates)
+            self.hidden = product('Hidden', dates, is_hidden=True)
+            self.sold_out = product('Sold out', dates, is_out_of_stock=True)
+            self.argan = product('Argan', oils)
+            db.session.commit()
+
+            order = Order(customer_name='Client', total_amount=20.0, status='Pending')
+            order.items = [
+                OrderItem(product_id=self.majhoul.id, product_name='Majhoul', quantity=1, unit='Kg', price_at_purchase=10.0),
+                OrderItem(product_id=self.argan.id, product_name='Argan', quantity=1, unit='Kg', price_at_purchase=10.0),
+                OrderItem(product_id=self.hidden.id, product_name='Hidden', quantity=1, unit='Kg', price_at_purchase=10.0),
+            ]
+            db.session.add(order)
+            db.session.commit()
+
+            self.ids = {p.name: p.id for p in Product.query.all()}
+            self.order_id = order.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def related_names(self, name):
+        with self.app.test_request_context():
+            return [p.name for p in get_catalog().related_products(self.ids[name])]
+
+    def test_same_category_then_rest(self):
+        # Pending orders do not count yet
+        self.assertEqual(self.related_names('Majhoul'), ['Boufeggous', 'Aziza', 'Argan'])
+        self.assertEqual(self.related_names('Argan'), ['Majhoul', 'Boufeggous', 'Aziza'])
+
+    def test_hidden_and_out_of_stock_are_excluded(self):
+        for name in self.ids:
+            related = self.related_names(name)
+            self.assertNotIn('Hidden', related)
+            self.assertNotIn('Sold out', related)
+            self.assertNotIn(name, related)
+
+    def test_confirming_and_cancelling_orders_refresh_the_index(self):
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+
+        self.client.post(f'/admin/orders/{self.order_id}/confirm')
+        self.assertEqual(self.related_names('Majhoul'), ['Argan', 'Boufeggous', 'Aziza'])
+
+        self.client.post(f'/admin/orders/{self.order_id}/cancel')
+        self.assertEqual(self.related_names('Majhoul'), ['Boufeggous', 'Aziza', 'Argan'])
+
+    def test_orders_refresh_only_the_recommendations(self):
+        with self.app.test_request_context():
+            snapshot = get_catalog()
+            catalog_version = get_version('catalog')
+
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+        self.client.post(f'/admin/orders/{self.order_id}/confirm')
+
+        with self.app.test_request_context():
+            # Same snapshot, catalog version untouched: page cache and ETags stay valid
+            self.assertIs(get_catalog(), snapshot)
+            self.assertEqual(get_version('catalog'), catalog_version)
+            self.assertEqual(get_version('recommendations'), snapshot.recommendations_version)
+            self.assertEqual([p.name for p in snapshot.bought_with([self.ids['Majhoul']])], ['Argan'])
+        self.assertEqual(self.related_names('Argan'), ['Majhoul', 'Boufeggous', 'Aziza'])
+        self.assertEqual(self.related_names('Majhoul'), ['Argan', 'Boufeggous', 'Aziza'])
+
+    def test_missing_change_log_reloads_all_lists(self):
+        self.related_names('Majhoul')
+        with self.app.app_context():
+            order = db.session.get(Order, self.order_id)
+            order.status = 'Completed'
+            db.session.commit()
+            rebuild_cooccurrence()
+            bump_version('recommendations')
+            db.session.commit()
+        self.assertEqual(self.related_names('Majhoul'), ['Argan', 'Boufeggous', 'Aziza'])
+
+    def test_concurrent_orders_get_their_own_versions(self):
+        with self.app.app_context():
+            publish_changes([self.ids['Majhoul'], self.ids['Argan']])
+            db.session.commit()
+            seen = get_version('recommendations')
+
+            # Another worker confirms an order (version seen + 1) while this one holds the old row
+            held = SiteSetting.query.filter_by(key='recommendations_version').one()
+            db.session.execute(text("UPDATE site_setting SET value = :v WHERE key = 'recommendations_version'"),
+                               {'v': str(seen + 1)})
+            db.session.add(CooccurrenceChange(version=seen + 1, product_ids=str(self.ids['Aziza'])))
+            publish_changes([self.ids['Boufeggous'], self.ids['Argan']])
+            db.session.commit()
+
+            self.assertEqual(held.value, str(seen + 2))
+            self.assertEqual(changed_since(seen), {self.ids['Aziza'], self.ids['Boufeggous'], self.ids['Argan']})
+            # A worker that refreshed after the first of the two still sees the second
+            self.assertEqual(changed_since(seen + 1), {self.ids['Boufeggous'], self.ids['Argan']})
+
+    def matrix(self):
+        with self.app.app_context():
+            return sorted((r.product_id, r.other_id, r.orders) for r in ProductCooccurrence.query.all())
+
+    def test_incremental_updates_match_rebuild(self):
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+        with self.app.app_context():
+            second = Order(customer_name='Client', total_amount=20.0, status='Pending')
+            second.items = [
+                OrderItem(product_id=self.ids['Majhoul'], product_name='Majhoul', quantity=1, unit='Kg', price_at_purchase=10.0),
+                OrderItem(product_id=self.ids['Majhoul'], product_name='Majhoul', quantity=2, unit='Kg', price_at_purchase=10.0),
+                OrderItem(product_id=self.ids['Argan'], product_name='Argan', quantity=1, unit='Kg', price_at_purchase=10.0),
+            ]
+            db.session.add(second)
+            db.session.commit()
+            second_id = second.id
+
+        self.client.post(f'/admin/orders/{self.order_id}/confirm')
+        self.client.post(f'/admin/orders/{second_id}/confirm')
+        incremental = self.matrix()
+        self.assertIn((self.ids['Majhoul'], self.ids['Argan'], 2), incremental)
+        self.assertIn((self.ids['Argan'], self.ids['Majhoul'], 2), incremental)
+
+        with self.app.app_context():
+            rebuild_cooccurrence()
+            db.session.commit()
+        self.assertEqual(self.matrix(), incremental)
+
+        # Cancelling drops the pairs that reach zero
+        self.client.post(f'/admin/orders/{self.order_id}/cancel')
+        self.assertEqual(self.matrix(), sorted([
+            (self.ids['Majhoul'], self.ids['Argan'], 1),
+            (self.ids['Argan'], self.ids['Majhoul'], 1),
+        ]))
+
+    def test_cart_shows_bought_together(self):
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+        self.client.post(f'/admin/orders/{self.order_id}/confirm')
+        self.client.get('/admin/logout')
+
+        self.client.post(f"/cart/add/{self.ids['Majhoul']}", data={'quantity': 1})
+        response = self.client.get('/cart')
+        self.assertIn(f'href="/product/{self.ids["Argan"]}"'.encode(), response.data)
+        self.assertNotIn(f'href="/product/{self.ids["Hidden"]}"'.encode(), response.data)
+
+    def test_product_page_shows_index(self):
+        response = self.client.get(f"/product/{self.ids['Majhoul']}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'href="/product/{self.ids["Boufeggous"]}"'.encode(), response.data)
+        self.assertNotIn(f'href="/product/{self.ids["Hidden"]}"'.encode(), response.data)
+
+if __name__ == '__main__':
+    unittest.main()
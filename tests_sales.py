@@ -0,0 +1,186 @@
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from models import User, Product, Category, Order, OrderItem, ProductSalesDaily, DailySales, DailyCitySales
+from sales import rebuild_sales_rollups, best_seller_ids
+
+class SalesRollupTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+            'CACHE_VERSION_TTL': 0
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            u = User(username='admin', role='admin')
+            u.set_password('password')
+            db.session.add(u)
+
+            c = Category(name='Dates')
+            db.session.add(c)
+            db.session.commit()
+
+            # 20 products, the oldest first
+            start = datetime(2024, 1, 1)
+            for i in range(20):
+                db.session.add(Product(name=f'Product {i:02d}', price=10.0, category_id=c.id, image_url='', unit='Kg',
+                                       created_at=start + timedelta(days=i)))
+            db.session.commit()
+            self.ids = {p.name: p.id for p in Product.query.all()}
+
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def place_order(self, lines, created_at=None):
+        with self.app.app_context():
+            order = Order(customer_name='Client', total_amount=0, status='Pending', created_at=created_at or datetime.utcnow())
+            order.items = [
+                OrderItem(product_id=self.ids[name], product_name=name, quantity=quantity, unit='Kg', price_at_purchase=price)
+                for name, quantity, price in lines
+            ]
+            db.session.add(order)
+            db.session.commit()
+            return order.id
+
+    def rollup(self):
+        with self.app.app_context():
+            return sorted((r.product_id, r.day, r.quantity, r.revenue, r.orders) for r in ProductSalesDaily.query.all())
+
+    def test_status_changes_update_rollup(self):
+        first = self.place_order([('Product 00', 2, 10.0), ('Product 01', 1, 50.0)])
+        second = self.place_order([('Product 00', 1, 10.0)])
+        self.client.post(f'/admin/orders/{first}/confirm')
+        self.client.post(f'/admin/orders/{second}/confirm')
+
+        today = datetime.utcnow().date()
+        self.assertEqual(self.rollup(), sorted([
+            (self.ids['Product 00'], today, 3.0, 30.0, 2),
+            (self.ids['Product 01'], today, 1.0, 50.0, 1),
+        ]))
+
+        incremental = self.rollup()
+        with self.app.app_context():
+            rebuild_sales_rollups()
+            db.session.commit()
+        self.assertEqual(self.rollup(), incremental)
+
+        self.client.post(f'/admin/orders/{first}/cancel')
+        self.assertEqual(self.rollup(), [(self.ids['Product 00'], today, 1.0, 10.0, 1)])
+
+    def test_best_sellers_use_rolling_window(self):
+        old = self.place_order([('Product 05', 100, 10.0)], created_at=datetime.utcnow() - timedelta(days=60))
+        recent = self.place_order([('Product 03', 1, 40.0), ('Product 04', 5, 2.0)])
+        self.client.post(f'/admin/orders/{old}/confirm')
+        self.client.post(f'/admin/orders/{recent}/confirm')
+
+        with self.app.app_context():
+            self.assertEqual(best_seller_ids(), [self.ids['Product 03'], self.ids['Product 04']])
+            self.assertEqual(best_seller_ids(rank_by='quantity'), [self.ids['Product 04'], self.ids['Product 03']])
+            self.assertEqual(best_seller_ids(days=90)[0], self.ids['Product 05'])
+
+    def test_home_page_lists_collections_only(self):
+        order = self.place_order([('Product 00', 1, 10.0)])
+        self.client.post(f'/admin/orders/{order}/confirm')
+
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        links = {name for name, pid in self.ids.items() if f'href="/product/{pid}"'.encode() in response.data}
+
+        # The best seller, then the eight newest products
+        expected = {'Product 00'} | {f'Product {i:02d}' for i in range(12, 20)}
+        self.assertEqual(links, expected)
+
+class DailyRollupTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+            'CACHE_VERSION_TTL': 0
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            u = User(username='admin', role='admin')
+            u.set_password('password')
+            db.session.add(u)
+            c = Category(name='Dates')
+            db.session.add(c)
+            db.session.commit()
+            p = Product(name='Majhoul', price=100.0, category_id=c.id, image_url='', unit='Kg')
+            db.session.add(p)
+            db.session.commit()
+            self.product_id = p.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def checkout(self, city, quantity=1.0):
+        self.client.post(f'/cart/add/{self.product_id}', data={'quantity': quantity})
+        self.client.post('/checkout', data={'name': 'Client', 'phone': '0600000000', 'city': city})
+        with self.app.app_context():
+            return Order.query.order_by(Order.id.desc()).first().id
+
+    def tables(self):
+        with self.app.app_context():
+            return (
+                sorted((r.day, r.status, r.orders, r.revenue) for r in DailySales.query.all()),
+                sorted((r.day, r.city, r.orders, r.revenue) for r in DailyCitySales.query.all()),
+            )
+
+    def test_checkout_and_status_changes(self):
+        today = datetime.utcnow().date()
+        first = self.checkout(' casablanca ')
+        second = self.checkout('Casablanca', quantity=2.0)
+        self.assertEqual(self.tables(), ([(today, 'Pending', 2, 370.0)], []))
+
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+        self.client.post(f'/admin/orders/{first}/confirm')
+        self.client.post(f'/admin/orders/{second}/confirm')
+        self.client.post(f'/admin/orders/{second}/cancel')
+
+        incremental = self.tables()
+        self.assertEqual(incremental, (
+            sorted([(today, 'Cancelled', 1, 235.0), (today, 'Completed', 1, 135.0)]),
+            [(today, 'Casablanca', 1, 135.0)],
+        ))
+
+        with self.app.app_context():
+            rebuild_sales_rollups()
+            db.session.commit()
+        self.assertEqual(self.tables(), incremental)
+
+    def test_dashboard_and_report_read_rollups(self):
+        order = self.checkout('Rabat')
+        self.checkout('Fes')
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+        self.client.post(f'/admin/orders/{order}/confirm')
+
+        with self.app.app_context():
+            # Order history gone: the numbers come from the rollups alone
+            OrderItem.query.delete()
+            Order.query.delete()
+            db.session.commit()
+
+        response = self.client.get('/admin/')
+        self.assertIn(b'135.0 MAD', response.data)
+
+        response = self.client.get('/admin/reports/revenue?days=7')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Rabat', response.data)
+        self.assertIn(b'Majhoul', response.data)
+        self.assertNotIn(b'Fes', response.data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+from app import create_app, db
+from sqlalchemy import text
+from models import Product, Category, Order, User
+from search import normalize_search_text, search_product_ids, substring_match
+
+class ShopSearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            c = Category(name='Dattes (تمور)')
+            db.session.add(c)
+            db.session.commit()
+
+            db.session.add_all([
+                Product(name='Dattes Majhoul (مجهول)', price=120.0, category_id=c.id, unit='Kg'),
+                Product(name='Figues Séchées (شريحة)', price=120.0, category_id=c.id, unit='Kg',
+                        description='Figues séchées au soleil'),
+                Product(name='Amandes Grillées', price=90.0, category_id=c.id, unit='Kg'),
+                Product(name='Dattes Cachées', price=10.0, category_id=c.id, unit='Kg', is_hidden=True),
+            ])
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_normalize(self):
+        self.assertEqual(normalize_search_text('Figues Séchées'), 'figues sechees')
+        # Harakat and hamza/madda variants fold to the bare letters
+        self.assertEqual(normalize_search_text('تَمْر'), 'تمر')
+        self.assertEqual(normalize_search_text('أإآ'), 'ااا')
+
+    def test_accent_insensitive(self):
+        response = self.client.get('/shop?q=sechees')
+        self.assertIn('Figues Séchées'.encode('utf-8'), response.data)
+        self.assertNotIn(b'Amandes', response.data)
+
+    def test_arabic_diacritics_insensitive(self):
+        response = self.client.get('/shop?q=' + 'مَجْهُول')
+        self.assertIn(b'Dattes Majhoul', response.data)
+        self.assertNotIn('Figues Séchées'.encode('utf-8'), response.data)
+
+    def test_prefix_and_hidden(self):
+        response = self.client.get('/shop?q=datt')
+        self.assertIn(b'Dattes Majhoul', response.data)
+        self.assertNotIn('Dattes Cachées'.encode('utf-8'), response.data)
+
+    def test_ranking(self):
+        with self.app.app_context():
+            ids = search_product_ids('figues')
+            top = db.session.get(Product, ids[0])
+            self.assertEqual(top.name, 'Figues Séchées (شريحة)')
+
+    def test_index_follows_edits(self):
+        with self.app.app_context():
+            product = Product.query.filter_by(name='Amandes Grillées').first()
+            product.name = 'Noix de Cajou'
+            db.session.commit()
+            self.assertEqual(search_product_ids('amandes'), [])
+            self.assertEqual(search_product_ids('cajou'), [product.id])
+
+class AdminSearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            admin = User(username='admin', email='boss@luxfakia.ma', role='admin')
+            admin.set_password('password')
+            orders_only = User(username='dispatch', role='customer', can_manage_orders=True)
+            orders_only.set_password('password')
+            customer = User(username='karima', email='karima@example.com')
+            customer.set_password('password')
+            db.session.add_all([admin, orders_only, customer])
+
+            c = Category(name='Dattes')
+            db.session.add(c)
+            db.session.commit()
+
+            db.session.add_all([
+                Product(name='Dattes Majhoul', price=120.0, category_id=c.id, unit='Kg'),
+                Product(name='Amandes Grillées', price=90.0, category_id=c.id, unit='Kg'),
+                Order(customer_name='Youssef Alaoui', customer_phone='0661234567', customer_city='Marrakech', total_amount=100.0),
+                Order(customer_name='Karima Bennani', customer_phone='0700112233', customer_city='Rabat', total_amount=50.0),
+            ])
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def names(self, kind, term):
+        model, column = {'product': (Product, 'name'), 'order': (Order, 'customer_name'), 'user': (User, 'username')}[kind]
+        with self.app.app_context():
+            return sorted(getattr(row, column) for row in model.query.filter(substring_match(kind, term)))
+
+    def test_substrings_anywhere(self):
+        self.assertEqual(self.names('product', 'JHOU'), ['Dattes Majhoul'])
+        self.assertEqual(self.names('order', '12345'), ['Youssef Alaoui'])
+        self.assertEqual(self.names('order', 'rakech'), ['Youssef Alaoui'])
+        self.assertEqual(self.names('user', 'example.com'), ['karima'])
+        # Shorter than a trigram: still found, by a scan
+        self.assertEqual(self.names('order', 'ab'), ['Karima Bennani'])
+        # LIKE wildcards are literal
+        self.assertEqual(self.names('product', '%'), [])
+
+    def test_index_follows_writes(self):
+        with self.app.app_context():
+            product = Product.query.filter_by(name='Amandes Grillées').first()
+            product.name = 'Noix de Cajou'
+            db.session.commit()
+        self.assertEqual(self.names('product', 'cajou'), ['Noix de Cajou'])
+        self.assertEqual(self.names('product', 'grill'), [])
+
+        with self.app.app_context():
+            db.session.delete(Order.query.filter_by(customer_city='Rabat').first())
+            db.session.commit()
+        self.assertEqual(self.names('order', 'benna'), [])
+
+    def test_lookup_reads_trigram_index(self):
+        with self.app.app_context():
+            plan = db.session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT rowid FROM order_trgm WHERE order_trgm MATCH '\"alaoui\"'"
+            )).fetchall()
+            self.assertIn('VIRTUAL TABLE INDEX', ' '.join(str(row[-1]) for row in plan))
+
+    def test_search_page_sections_follow_permissions(self):
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+        response = self.client.get('/admin/search?q=karima')
+        self.assertIn(b'Karima Bennani', response.data)
+        self.assertIn(b'karima@example.com', response.data)
+        self.client.get('/admin/logout')
+
+        self.client.post('/admin/login', data={'username': 'dispatch', 'password': 'password'})
+        response = self.client.get('/admin/search?q=karima')
+        self.assertIn(b'Karima Bennani', response.data)
+        self.assertNotIn(b'karima@example.com', response.data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from models import User, SiteSetting
+from settings import get_settings, get_setting
+
+class SiteSettingsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+            'CACHE_VERSION_TTL': 60
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            u = User(username='admin', role='admin')
+            u.set_password('password')
+            db.session.add(u)
+            db.session.add(SiteSetting(key='shipping_cost', value='not a number'))
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_typed_defaults(self):
+        with self.app.app_context():
+            settings = get_settings()
+            self.assertEqual(settings['free_shipping_threshold'], 500.0)
+            # Unparsable values fall back to the default
+            self.assertEqual(settings['shipping_cost'], 35.0)
+            self.assertEqual(settings['meta_pixel_id'], '1626031432043896')
+
+    def test_cached_between_requests(self):
+        self.client.get('/cart')
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            if 'site_setting' in statement:
+                statements.append(statement)
+
+        with self.app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                self.client.get('/cart')
+                self.client.get('/checkout')
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(statements, [])
+
+    def test_admin_save_invalidates(self):
+        with self.app.app_context():
+            self.assertEqual(get_setting('shipping_cost'), 35.0)
+
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password'})
+        self.client.post('/admin/settings/home', data={'free_shipping_threshold': '300', 'shipping_cost': '20'})
+
+        with self.app.app_context():
+            self.assertEqual(get_setting('free_shipping_threshold'), 300.0)
+            self.assertEqual(get_setting('shipping_cost'), 20.0)
+            version = SiteSetting.query.filter_by(key='settings_version').first()
+            self.assertIsNotNone(version)
+
+if __name__ == '__main__':
+    unittest.main()
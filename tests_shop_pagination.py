@@ -0,0 +1,136 @@
+import re
+import unittest
+from app import create_app, db
+from models import Product, Category
+from catalog import list_visible_product_ids, encode_cursor
+
+class ShopPaginationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False
+        })
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            c1 = Category(name='Dates')
+            c2 = Category(name='Nuts')
+            db.session.add_all([c1, c2])
+            db.session.commit()
+
+            # 30 products, several sharing a price so the id tiebreaker matters
+            for i in range(30):
+                db.session.add(Product(
+                    name=f'Item {i:02d}',
+                    price=float(10 + (i % 7)),
+                    category_id=c1.id if i % 2 == 0 else c2.id,
+                    unit='Kg'
+                ))
+            db.session.add(Product(name='Hidden', price=1.0, category_id=c1.id, unit='Kg', is_hidden=True))
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def product_ids(self, html):
+        # Each card links to its product twice (image and title)
+        ids = re.findall(r'href="/product/(\d+)"', html)
+        return [int(i) for i in ids[::2]]
+
+    def collect(self, query):
+        response = self.client.get(f'/shop?{query}')
+        self.assertEqual(response.status_code, 200)
+        html = response.data.decode('utf-8')
+        ids = self.product_ids(html)
+
+        match = re.search(r'data-next-url="([^"]+)"', html)
+        next_url = match.group(1).replace('&amp;', '&') if match else None
+        while next_url:
+            data = self.client.get(next_url).get_json()
+            ids.extend(self.product_ids(data['html']))
+            next_url = data['next_url']
+        return ids
+
+    def test_first_page_is_limited(self):
+        response = self.client.get('/shop?per_page=10')
+        html = response.data.decode('utf-8')
+        self.assertEqual(len(self.product_ids(html)), 10)
+        self.assertIn('30 Produits', ' '.join(html.split()))
+        self.assertIn('id="shop-sentinel"', html)
+
+    def test_keyset_walks_every_product_once(self):
+        ids = self.collect('per_page=7&sort=price-desc')
+        self.assertEqual(len(ids), 30)
+        self.assertEqual(len(set(ids)), 30)
+
+        with self.app.app_context():
+            expected = [p.id for p in Product.query.filter_by(is_hidden=False)
+                        .order_by(Product.price.desc(), Product.id.desc()).all()]
+        self.assertEqual(ids, expected)
+
+    def test_sort_by_name_within_category(self):
+        ids = self.collect('per_page=4&sort=name-asc&category=Nuts')
+        with self.app.app_context():
+            names = [db.session.get(Product, i).name for i in ids]
+        self.assertEqual(len(names), 15)
+        self.assertEqual(names, sorted(names))
+
+    def test_search_pages_by_relevance(self):
+        ids = self.collect('per_page=4&q=item')
+        self.assertEqual(len(ids), 30)
+        self.assertEqual(len(set(ids)), 30)
+
+    def test_mismatched_cursor_is_ignored(self):
+        with self.app.app_context():
+            first, _ = list_visible_product_ids('name-asc', limit=5)
+            # A name cursor needs a string and an integer id
+            for values in ([12.5, 5], ['Item 04', '5'], [True, 5], [{'a': 1}, 5], ['Item 04', 5.5]):
+                ids, _ = list_visible_product_ids('name-asc', after=encode_cursor(values), limit=5)
+                self.assertEqual(ids, first, values)
+            ids, _ = list_visible_product_ids('name-asc', after=encode_cursor(['Item 04', 5]), limit=5)
+            self.assertNotEqual(ids, first)
+
+            # A price cursor needs a number
+            first, _ = list_visible_product_ids('price-asc', limit=5)
+            ids, _ = list_visible_product_ids('price-asc', after=encode_cursor(['Item 04', 5]), limit=5)
+            self.assertEqual(ids, first)
+            ids, _ = list_visible_product_ids('price-asc', after=encode_cursor([12, 5]), limit=5)
+            self.assertNotEqual(ids, first)
+
+        response = self.client.get('/shop?sort=price-desc&after=' + encode_cursor(['Item 04', [1]]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_is_not_capped(self):
+        with self.app.app_context():
+            category = Category.query.filter_by(name='Nuts').first()
+            for i in range(250):
+                db.session.add(Product(name=f'Amande {i:03d}', price=20.0, category_id=category.id, unit='Kg'))
+            db.session.commit()
+
+        response = self.client.get('/shop?q=amande')
+        self.assertIn('250 Produits', ' '.join(response.data.decode('utf-8').split()))
+
+        ids = self.collect('per_page=48&q=amande')
+        self.assertEqual(len(ids), 250)
+        self.assertEqual(len(set(ids)), 250)
+        self.assertEqual(len(self.collect('per_page=48&q=amande&sort=price-asc')), 250)
+
+    def test_sorted_search_within_category(self):
+        ids = self.collect('per_page=4&q=item&sort=name-asc&category=Dates')
+        with self.app.app_context():
+            names = [db.session.get(Product, i).name for i in ids]
+        self.assertEqual(len(names), 15)
+        self.assertEqual(names, sorted(names))
+
+    def test_negative_search_offset_starts_at_the_top(self):
+        first = self.client.get('/shop/items?per_page=5&q=item').get_json()
+        shifted = self.client.get(f"/shop/items?per_page=5&q=item&after={encode_cursor([-5])}").get_json()
+        self.assertEqual(self.product_ids(shifted['html']), self.product_ids(first['html']))
+        self.assertNotIn('total', shifted)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,6 +14,9 @@ translations = {
         'address_val': 'Azli, près de Fran Trab, en face du poste de police',
         'location_label': 'Localisation ✅ ✅',
         'search_placeholder': 'Rechercher...',
+        'admin_search_placeholder': 'Produits, commandes, utilisateurs...',
+        'search_results': 'Résultats pour',
+        'no_results': 'Aucun résultat.',
         'login_register': 'Connexion / Inscription',
         'my_account': 'Mon Compte',
         'logout': 'Déconnexion',
@@ -67,6 +70,8 @@ translations = {
         'welcome_text': 'Nous vous apportons les meilleurs fruits secs et noix marocains à votre porte. Découvrez le goût authentique de la tradition.',
         'gift_cards_link': 'Cartes Cadeaux',
         'best_sellers_link': 'Meilleures Ventes',
+        'badge_best_seller': 'Meilleure vente',
+        'badge_new': 'Nouveau',
 
         # Footer
         'footer_story': 'Notre Histoire',
@@ -121,6 +126,13 @@ translations = {
 
         # Admin Dashboard
         'total_revenue': 'Revenu Total',
+        'revenue_report': 'Rapport des ventes',
+        'report_period_days': 'Période (jours)',
+        'daily_revenue': 'Ventes par jour',
+        'top_products': 'Meilleurs produits',
+        'top_cities': 'Meilleures villes',
+        'th_revenue': "Chiffre d'affaires",
+        'no_sales_yet': 'Aucune vente sur cette période.',
         'total_orders': 'Total Commandes',
         'pending': 'En attente',
         'completed': 'Terminé',
@@ -140,6 +152,11 @@ translations = {
         'sort_newest': 'Plus récents',
         'btn_filter': 'Filtrer',
         'btn_clear': 'Effacer',
+        'search_orders_placeholder': 'Nom ou téléphone du client',
+        'date_from': 'Du',
+        'date_to': 'Au',
+        'older_orders': 'Commandes plus anciennes',
+        'newest_orders': 'Plus récentes',
 
         # Admin Tables
         'th_id': 'ID',
@@ -193,6 +210,7 @@ translations = {
         'out_of_stock': 'Rupture de stock',
         'show_more': 'Voir plus',
         'shop_collection': 'Découvrez notre collection',
+        'search_results_for': 'Résultats pour « {query} »',
         'products_count_suffix': 'Produits',
         'all_products_link': 'Tous les produits',
         'filter_all_short': 'Tout',
@@ -200,6 +218,7 @@ translations = {
         'continue_shopping': 'Continuer mes achats',
         'quantity': 'Quantité',
         'you_may_also_like': 'Vous aimerez aussi',
+        'frequently_bought_together': 'Souvent achetés ensemble',
         'quick_add': 'Ajout rapide',
         'view_details': 'Voir les détails',
         'shopping_cart': 'Panier',
@@ -443,6 +462,9 @@ translations = {
         'address_val': 'أزلي قرب فران التراب أون-فاص مع البوسط البوليس',
         'location_label': 'Localisation ✅ ✅',
         'search_placeholder': 'بحث...',
+        'admin_search_placeholder': 'منتجات، طلبات، مستخدمون...',
+        'search_results': 'نتائج البحث عن',
+        'no_results': 'لا توجد نتائج.',
         'login_register': 'دخول / تسجيل',
         'my_account': 'حسابي',
         'logout': 'خروج',
@@ -496,6 +518,8 @@ translations = {
         'welcome_text': 'نحضر لكم أجود الفواكه الجافة والمكسرات المغربية إلى باب منزلكم. جربوا الطعم الأصيل للتقاليد.',
         'gift_cards_link': 'بطاقات الهدايا',
         'best_sellers_link': 'الأكثر مبيعًا',
+        'badge_best_seller': 'الأكثر مبيعًا',
+        'badge_new': 'جديد',
 
         # Footer
         'footer_story': 'قصتنا',
@@ -550,6 +574,13 @@ translations = {
 
         # Admin Dashboard
         'total_revenue': 'إجمالي الإيرادات',
+        'revenue_report': 'تقرير المبيعات',
+        'report_period_days': 'الفترة (أيام)',
+        'daily_revenue': 'المبيعات اليومية',
+        'top_products': 'أفضل المنتجات',
+        'top_cities': 'أفضل المدن',
+        'th_revenue': 'الإيرادات',
+        'no_sales_yet': 'لا توجد مبيعات في هذه الفترة.',
         'total_orders': 'إجمالي الطلبات',
         'pending': 'قيد الانتظار',
         'completed': 'مكتمل',
@@ -569,6 +600,11 @@ translations = {
         'sort_newest': 'الأحدث',
         'btn_filter': 'تصفية',
         'btn_clear': 'مسح',
+        'search_orders_placeholder': 'اسم أو هاتف العميل',
+        'date_from': 'من',
+        'date_to': 'إلى',
+        'older_orders': 'طلبات أقدم',
+        'newest_orders': 'الأحدث',
 
         # Admin Tables
         'th_id': 'م',
@@ -622,6 +658,7 @@ translations = {
         'out_of_stock': 'نفذت الكمية',
         'show_more': 'عرض المزيد',
         'shop_collection': 'تسوق مجموعتنا',
+        'search_results_for': 'نتائج البحث عن « {query} »',
         'products_count_suffix': 'منتجات',
         'all_products_link': 'جميع المنتجات',
         'filter_all_short': 'الكل',
@@ -629,6 +666,7 @@ translations = {
         'continue_shopping': 'متابعة التسوق',
         'quantity': 'الكمية',
         'you_may_also_like': 'قد يعجبك أيضًا',
+        'frequently_bought_together': 'غالبًا ما تُشترى معًا',
         'quick_add': 'إضافة سريعة',
         'view_details': 'عرض التفاصيل',
         'shopping_cart': 'سلة التسوق',